@@ -0,0 +1,138 @@
+# %%
+"""
+Consistency checks of the incremental feature paths against the batch `_get_features` path, on synthetic data
+with missing prices: the streaming state against `_ema`, `_mean` and `_lags`, and the month-partitioned process
+pool features and the features from the shared weather block against the serial direct ones, and the weather block
+extended from a stored version against the one computed from scratch, bit for bit.
+Runs offline and exits with an error when a check fails.
+
+Usage:
+    python benchmarks/consistency.py --days 90 --jobs 2
+
+Author: Aman Bhatt
+"""
+import sys, os
+import argparse
+import tempfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_PATH)
+
+parser = argparse.ArgumentParser(description='Check the incremental feature paths against the batch path.')
+parser.add_argument('--market', default='dam', choices=['dam', 'rtm'])
+parser.add_argument('--days', type=int, default=90, help='Days of synthetic history (several months, so that there are partitions).')
+parser.add_argument('--jobs', type=int, default=2, help='Worker processes of the parallel features.')
+parser.add_argument('--workdir', default=None, help='Scratch project directory (a temporary one by default).')
+args = parser.parse_args()
+
+# caches and saved states are written to the scratch project only
+os.environ['PROJECT_DIR'] = args.workdir or tempfile.mkdtemp(prefix='price_forecast_check_')
+PROJECT_PATH = os.environ['PROJECT_DIR']
+
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+
+# %%
+from src.feature_engineering.build_features import FeatureEngineering
+from src.feature_engineering.streaming_state import StreamingState
+from config.paths import *
+from benchmarks.synthetic_data import synthetic_market, synthetic_history, shift_inputs
+
+os.makedirs(LOGS_PATH, exist_ok=True)
+market_type = args.market
+failures = []
+
+
+def compare(name, result, expected, rtol=1e-9, atol=1e-6):
+    """
+    Compares two frames column by column, missing values included, and records a failure.
+    """
+    try:
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_exact=False, rtol=rtol, atol=atol, check_dtype=False)
+        print(f'{name}: OK')
+    except AssertionError as e:
+        print(f'{name}: FAILED\n{e}')
+        failures.append(name)
+
+
+def with_gaps(df, column):
+    """
+    Blanks one isolated price and a gap longer than every EWMA span and rolling window, in the same market data.
+    """
+    df = df.copy()
+    df.loc[100, column] = np.nan
+    df.loc[96 * 10:96 * 16, column] = np.nan
+    return df
+
+
+# %%
+featured_data = FeatureEngineering(PROJECT_PATH)
+column = f'mcp_{market_type}'
+market = with_gaps(synthetic_market(market_type, args.days), column)
+
+# streaming state, fed day by day and saved and restored half-way, against the batch features
+batch = market[['datetime', column]].copy()
+batch = featured_data._lags(featured_data._mean(featured_data._ema(batch, market_type), market_type))
+state = StreamingState(market_type)
+blocks = []
+for day in range(args.days):
+    if day == args.days // 2:
+        state.save(PROJECT_PATH, f'{market_type}_state')
+        state = StreamingState.load(PROJECT_PATH, f'{market_type}_state')
+    block = market.iloc[96 * day:96 * (day + 1)]
+    blocks.append(state.update(block['datetime'], block[column]))
+compare('streaming state with missing prices', pd.concat(blocks), batch[['datetime'] + state.feature_names])
+
+# %%
+# inputs with holes: the merge drops the missing prices, a day and a half of weather is missing and the last
+# market day is partial
+history = synthetic_history(args.days / 365)
+history[market_type] = market.iloc[:-40]
+history['weather'] = history['weather'].drop(index=range(96 * 30 + 20, 96 * 31 + 68)).reset_index(drop=True)
+dfs, weather = shift_inputs(featured_data, market_type, history)
+data = featured_data.merge_dataframes(dfs)
+weather_block = featured_data.shift_date(featured_data.weather_block(history['weather'], history['hydro']),
+                                         -1 if market_type == 'dam' else 2)
+
+# the weather block extended from a stored older version, whose last forecast rows were since revised, against
+# the one computed from scratch
+scratch = featured_data.weather_block(history['weather'], history['hydro'])
+shutil.rmtree(os.path.join(FEATURES_PATH, 'weather_block'), ignore_errors=True)
+older = history['weather'].iloc[:-96 * 5].copy()
+older.iloc[-40:, 1:] = older.iloc[-40:, 1:] + 1
+for weather_data in [older, history['weather']]:
+    featured_data._weather_block_cache = {}
+    extended = featured_data.weather_block(weather_data, history['hydro'])
+compare('weather block extended from a stored version', extended, scratch, rtol=0, atol=0)
+
+# weather features from the shared block against the ones computed from the market rows
+for task in ['train', 'inference']:
+    direct = featured_data._get_features(data.copy(), weather, market_type, task)
+    shared = featured_data._get_features(data.copy(), weather, market_type, task, weather_block=weather_block)
+    compare(f'{task} features from the shared weather block', shared, direct, rtol=0, atol=0)
+
+# parallel features against the serial ones; the parallel path replaces the partition-local EWMAs, which start
+# cold at every halo, with full-history ones
+for task in ['train', 'inference']:
+    for block in [None, weather_block]:
+        serial = featured_data._get_features(data.copy(), weather, market_type, task, weather_block=block)
+        parallel = featured_data._get_features_parallel(data.copy(), weather, market_type, task, n_jobs=args.jobs,
+                                                        weather_block=block)
+        source = 'shared weather block' if block is not None else 'weather columns'
+        compare(f'parallel {task} features from {source}', parallel, serial, rtol=0, atol=0)
+
+# the instance pickled into every task must not carry the cached weather block
+pickled = len(pickle.dumps(featured_data))
+if pickled > 10 * 1024:
+    print(f'pickled FeatureEngineering: FAILED, {pickled} bytes')
+    failures.append('pickled FeatureEngineering')
+else:
+    print(f'pickled FeatureEngineering: OK, {pickled} bytes')
+
+# %%
+if failures:
+    sys.exit('Consistency checks failed: ' + ', '.join(failures))
+print('All consistency checks passed.')
@@ -0,0 +1,48 @@
+# %%
+"""
+Benchmark of parallel feature generation against the number of worker processes.
+
+Usage:
+    python benchmarks/feature_scaling.py --days 1095 --jobs 1 2 4 8
+
+Author: Aman Bhatt
+"""
+import time, sys, os
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+import warnings
+warnings.filterwarnings('ignore')
+
+# %%
+from src.feature_engineering.build_features import FeatureEngineering
+from benchmarks.synthetic_data import synthetic_inputs
+
+parser = argparse.ArgumentParser(description='Benchmark parallel feature generation.')
+parser.add_argument('--market', default='dam', choices=['dam', 'rtm'])
+parser.add_argument('--days', type=int, default=730, help='Days of synthetic history.')
+parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()], help='Worker counts to time.')
+parser.add_argument('--compact', action='store_true', help='Use the compact dtype mode.')
+args = parser.parse_args()
+
+featured_data = FeatureEngineering(PROJECT_PATH, compact=args.compact)
+dfs, weather = synthetic_inputs(featured_data, args.market, args.days)
+data = featured_data.merge_dataframes(dfs)
+print(f'{args.market}: {len(data)} rows, {os.cpu_count()} cores.')
+
+# %%
+start_time = time.time()
+serial = featured_data._get_features(data.copy(), weather, args.market)
+serial_time = time.time() - start_time
+print(f'  serial: {serial_time:.2f}s')
+
+for n_jobs in sorted(set(args.jobs)):
+    start_time = time.time()
+    parallel = featured_data._get_features_parallel(data.copy(), weather, args.market, n_jobs=n_jobs)
+    parallel_time = time.time() - start_time
+    identical = parallel is not None and serial.equals(parallel)
+    print(f'  {n_jobs} workers: {parallel_time:.2f}s, speedup {serial_time / parallel_time:.2f}x, identical: {identical}')
@@ -0,0 +1,157 @@
+# %%
+"""
+Benchmark of every pipeline stage on synthetic data: wall time and peak traced memory of merging, each feature
+engineering stage, feature and parameter search, training, forecasting, payload building and accuracy reports.
+Runs offline; models, forecasts and caches are written to a scratch project directory. In compact mode the
+forecast model's predictions from compact features are checked against full-precision ones, and the run exits
+with an error when they differ by more than the tolerance.
+
+Usage:
+    python benchmarks/pipeline.py --years 1 2 4 --locations 16 --market dam --trials 2 --output benchmarks.csv
+
+Author: Aman Bhatt
+"""
+import time, sys, os
+import argparse
+import tempfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_PATH)
+
+parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic data.')
+parser.add_argument('--market', default='dam', choices=['dam', 'rtm'])
+parser.add_argument('--years', type=float, nargs='+', default=[1], help='Years of synthetic history, one run each.')
+parser.add_argument('--locations', type=int, nargs='+', default=[None], help='Locations per location type, one run each.')
+parser.add_argument('--trials', type=int, default=2, help='Optuna trials of the parameter search.')
+parser.add_argument('--features', type=int, default=10, help='Number of features selected.')
+parser.add_argument('--compact', action='store_true', help='Use the compact dtype mode.')
+parser.add_argument('--tolerance', type=float, default=0.001,
+                    help='Largest relative prediction difference accepted between compact and full-precision features.')
+parser.add_argument('--no-memory', action='store_true', help='Do not trace allocations (faster, timing only).')
+parser.add_argument('--workdir', default=None, help='Scratch project directory (a temporary one by default).')
+parser.add_argument('--output', default=None, help='CSV file the records are appended to.')
+args = parser.parse_args()
+
+# every path of config.paths points into the scratch project, so the real data, models and forecasts are untouched
+os.environ['PROJECT_DIR'] = args.workdir or tempfile.mkdtemp(prefix='price_forecast_bench_')
+PROJECT_PATH = os.environ['PROJECT_DIR']
+
+import warnings
+warnings.filterwarnings('ignore')
+
+import matplotlib
+matplotlib.use('Agg')
+
+# %%
+from src.feature_engineering.build_features import FeatureEngineering
+from src.model_building.train_model import ModelTraining
+from src.model_building.forecast_model import ModelForecaster
+from src.model_building.eval_model import ModelEvaluator
+from src.model_building.accuracy_report import AccuracyReport
+from src.db_insertion.db_insertion import DAMInsertion, DirInsertion
+from src.utils import *
+from config.paths import *
+from benchmarks.synthetic_data import synthetic_history, synthetic_forecast, shift_inputs
+from benchmarks.timing import Benchmark
+
+for path in [MODELS_PATH, DAM_FORECAST_PATH, DIR_FORECAST_PATH]:
+    os.makedirs(path, exist_ok=True)
+
+benchmark = Benchmark(track_memory=not args.no_memory)
+market_type = args.market
+failures = []
+print(f'Scratch project: {PROJECT_PATH}')
+
+
+# %%
+def feature_stages(featured_data, data, weather, market_type):
+    """
+    Runs the stages of `_get_features` one by one, each measured on its own.
+    """
+    data = benchmark.measure('compact_inputs', featured_data._compact_inputs, data)
+    data = benchmark.measure('capping', featured_data._capping, data)
+    data = benchmark.measure('datetime_features', featured_data._datetime_features, data)
+    data = benchmark.measure('target', featured_data._target, data, market_type)
+    data = benchmark.measure('lags', featured_data._lags, data)
+    data = benchmark.measure('min_max', featured_data._min_max, data)
+    data = benchmark.measure('ema', featured_data._ema, data, market_type)
+    data = benchmark.measure('mean', featured_data._mean, data, market_type)
+    data = benchmark.measure('interaction', featured_data._interaction, data, market_type)
+
+    def cyclic(data):
+        for feature, period in [('tb', 96), ('hour', 24), ('dow', 6), ('doy', 366)]:
+            data = featured_data._cyclic(data, feature, period)
+        return data
+    data = benchmark.measure('cyclic', cyclic, data)
+    data = benchmark.measure('weather_features', featured_data._weather_features, data, weather)
+    data = benchmark.measure('interaction_features', featured_data._interaction_features, data, weather, market_type)
+    return data.drop('date', axis=1).dropna().reset_index(drop=True)
+
+
+for years in args.years:
+    for n_locations in args.locations:
+        print(f'{market_type}: {years} years, {n_locations or "configured"} locations')
+        featured_data = FeatureEngineering(PROJECT_PATH, compact=args.compact)
+        build_model = ModelTraining(PROJECT_PATH)
+        history = synthetic_history(years, n_locations)
+        dfs, weather = shift_inputs(featured_data, market_type, history)
+        benchmark.set_labels(market=market_type, years=years, locations=n_locations or 'configured', compact=args.compact)
+
+        # %%
+        data = benchmark.measure('merge_dataframes', featured_data.merge_dataframes, dfs)
+        benchmark.measure('weather_block', featured_data.weather_block, history['weather'], history['hydro'])
+        feature_stages(featured_data, data.copy(), weather, market_type)
+        training_data = benchmark.measure('get_features', featured_data._get_features, data.copy(), weather, market_type)
+
+        # %%
+        best_features, best_params = benchmark.measure('features_n_params', build_model._features_n_params,
+                                                       training_data, args.trials, args.features)
+        training_upto = training_data['datetime'][::96].iloc[-2].strftime('%Y-%m-%d')
+        X_train, y_train, _, _, _, _ = build_model._split_data(training_data, training_upto, training_upto)
+        model = benchmark.measure('train_model', build_model._train_model, X_train, y_train, best_params, best_features, 'regression')
+        save_pickle(model, MODELS_PATH, f'{market_type}_forecast')
+        if market_type == 'dam':
+            for name, alpha in [('lower', 0.1), ('upper', 0.9)]:
+                quantile_model = benchmark.measure(f'train_model_{name}', build_model._train_model, X_train, y_train,
+                                                   best_params, best_features, 'quantile', alpha)
+                save_pickle(quantile_model, MODELS_PATH, f'{market_type}_{name}')
+
+        # %%
+        forecasting = ModelForecaster(MODELS_PATH, market_type)
+        inference_data = featured_data._get_features(data.copy(), weather, market_type, task='inference')
+        forecast_date = forecasting.forecasting_date(inference_data, market_type)
+        forecast = benchmark.measure('create_forecast', forecasting.create_forecast, inference_data, forecast_date, market_type)
+        if market_type == 'dam':
+            benchmark.measure('payload', DAMInsertion().forecast_dict, forecast, forecast_date, 'dam_forecast')
+        else:
+            forecast = forecast.rename(columns={f'{market_type}_forecast': 'dir_forecast'})
+            benchmark.measure('payload', DirInsertion().forecast_dict, forecast, forecast_date, 'dir')
+
+        # %%
+        if args.compact:
+            # the same rows at full precision; the model must predict the same from both
+            reference_data = FeatureEngineering(PROJECT_PATH)._get_features(data.copy(), weather, market_type, task='inference')
+            rows = inference_data['datetime'].isin(reference_data['datetime'])
+            X_compact = inference_data[rows].reset_index(drop=True)
+            X_reference = reference_data[reference_data['datetime'].isin(X_compact['datetime'])].reset_index(drop=True)
+            within = benchmark.measure('compact_tolerance', ModelEvaluator(model, best_features).check_prediction_tolerance,
+                                       X_reference, X_compact, args.tolerance)
+            if not within:
+                failures.append(f'{market_type}, {years} years, {n_locations or "configured"} locations')
+
+        # %%
+        accuracy_report = AccuracyReport()
+        actual = history[market_type][['datetime', f'mcp_{market_type}']]
+        df = featured_data.merge_dataframes([synthetic_forecast(actual, f'mcp_{market_type}'), actual])
+        benchmark.measure('price_accuracy', accuracy_report.price_accuracy, df, market_type)
+        dir_actual = accuracy_report.directional_actual(featured_data.merge_dataframes([history['rtm'], history['dam']]))
+        df = featured_data.merge_dataframes([synthetic_forecast(dir_actual, 'actual').round(0), dir_actual])
+        benchmark.measure('directional_accuracy', accuracy_report.directional_accuracy, df)
+
+# %%
+print(benchmark.report().to_string(index=False))
+if args.output:
+    benchmark.save(args.output)
+    print(f'Records appended to {args.output}.')
+if failures:
+    sys.exit(f'Compact predictions exceeded the tolerance of {args.tolerance}: ' + '; '.join(failures))
@@ -0,0 +1,163 @@
+'''
+This script generates synthetic market and weather data with the same layout as the processed data,
+so that feature engineering and training can be benchmarked without API access.
+
+Author: Aman Bhatt
+'''
+
+import os
+import sys
+import yaml
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+# same renaming as WeatherDataFetcher._preprocess_weather_data
+FEATURE_NAMES = {'windspeed': 'ws', 'ghi_instant': 'ghi', 'relativehumidity': 'rh', 'winddirection': 'wd',
+                 'temperature': 'temp', 'felttemperature': 'atemp', 'precipitation': 'prec'}
+LOCATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'locations.yaml')
+
+
+def synthetic_market(market_type, days, start='2021-01-01', seed=0):
+    """
+    Generates processed market data on the 15-minute grid.
+
+    Args:
+        market_type (str): Type of market ('dam' or 'rtm').
+        days (int): Number of days.
+        start (str): First day.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Market data with the columns of the processed market data.
+    """
+    rng = np.random.default_rng(seed)
+    n = days * 96
+    slots = np.arange(n)
+    mcp = 4000 + 1500 * np.sin(2 * np.pi * slots / 96) + 500 * np.sin(2 * np.pi * slots / (96 * 365)) + rng.normal(0, 300, n)
+    df = pd.DataFrame({'datetime': pd.date_range(start, periods=n, freq='15min'),
+                       f'mcp_{market_type}': np.clip(mcp, 0, 10000).round(2),
+                       f'clearedvolume_{market_type}': rng.uniform(5000, 9000, n).round(1),
+                       f'pb_{market_type}': rng.uniform(8000, 14000, n).round(1),
+                       f'sb_{market_type}': rng.uniform(6000, 15000, n).round(1)})
+    df[f'diff_sb_pb_{market_type}'] = df[f'pb_{market_type}'] - df[f'sb_{market_type}']
+    return df
+
+
+def synthetic_weather(location_type, days, start='2021-01-01', seed=1, n_locations=None):
+    """
+    Generates processed weather data for the locations of one type in config/locations.yaml.
+
+    Args:
+        location_type (str): Type of locations ('weather', 'wind', 'hydro' or 'solar').
+        days (int): Number of days.
+        start (str): First day.
+        seed (int): Random seed.
+        n_locations (int): Number of locations (defaults to the configured ones); extra locations get generated names.
+
+    Returns:
+        pd.DataFrame: Weather data with one column per feature and location.
+    """
+    with open(LOCATIONS_PATH, 'r') as file:
+        locations = yaml.safe_load(file)[location_type]
+    rng = np.random.default_rng(seed)
+    n = days * 96
+    features = [FEATURE_NAMES[feature] for feature in locations['required_features']]
+    names = sorted(location[3] for location in locations['locations'])
+    if n_locations is not None:
+        names = sorted((names + [f'x{i:02d}' for i in range(max(0, n_locations - len(names)))])[:n_locations])
+
+    # daily cycle plus noise, so that daily means and day-over-day changes are not degenerate
+    daily = np.sin(2 * np.pi * np.arange(n) / 96)
+    columns = {'datetime': pd.date_range(start, periods=n, freq='15min')}
+    for feature in features:
+        for name in names:
+            columns[f'{feature}_{name[:3]}'] = (20 + 5 * daily + rng.normal(0, 2, n)).round(2)
+    return pd.DataFrame(columns)
+
+
+def synthetic_history(years, n_locations=None, start='2021-01-01', seed=0):
+    """
+    Generates the unshifted processed data of both markets and every location type.
+
+    Args:
+        years (float): Years of history.
+        n_locations (int): Number of locations of every location type (defaults to the configured ones).
+        start (str): First day.
+        seed (int): Random seed.
+
+    Returns:
+        dict: DataFrames keyed by 'dam', 'rtm', 'weather', 'hydro', 'solar' and 'wind'.
+    """
+    days = int(round(years * 365))
+    history = {'dam': synthetic_market('dam', days, start, seed), 'rtm': synthetic_market('rtm', days, start, seed + 1)}
+    for i, location_type in enumerate(['weather', 'hydro', 'solar', 'wind']):
+        history[location_type] = synthetic_weather(location_type, days, start, seed + i + 2, n_locations)
+    return history
+
+
+def synthetic_forecast(actual, column, seed=0, noise=0.1):
+    """
+    Generates a forecast of an actual series with relative noise, laid out like the forecasts fetched for the
+    accuracy reports.
+
+    Args:
+        actual (pd.DataFrame): Data with datetime and the actual column.
+        column (str): Column to forecast.
+        seed (int): Random seed.
+        noise (float): Standard deviation of the relative error.
+
+    Returns:
+        pd.DataFrame: Datetime and forecast.
+    """
+    rng = np.random.default_rng(seed)
+    values = actual[column].to_numpy(dtype='float64')
+    return pd.DataFrame({'datetime': actual['datetime'].to_numpy(),
+                         'forecast': (values * (1 + rng.normal(0, noise, len(values)))).round(2)})
+
+
+def synthetic_inputs(featured_data, market_type, days, start='2021-01-01', seed=0, n_locations=None):
+    """
+    Generates every input of a market, shifted the way the train and forecast scripts shift them.
+
+    Args:
+        featured_data (FeatureEngineering): Instance used for shifting dates.
+        market_type (str): Type of market ('dam' or 'rtm').
+        days (int): Number of days.
+        start (str): First day.
+        seed (int): Random seed.
+        n_locations (int): Number of locations of every location type (defaults to the configured ones).
+
+    Returns:
+        tuple: List of frames in merge order, and the weather frame.
+    """
+    history = synthetic_history(days / 365, n_locations, start, seed)
+    return shift_inputs(featured_data, market_type, history)
+
+
+def shift_inputs(featured_data, market_type, history):
+    """
+    Shifts the frames of `synthetic_history` the way the train and forecast scripts shift them.
+
+    Args:
+        featured_data (FeatureEngineering): Instance used for shifting dates.
+        market_type (str): Type of market ('dam' or 'rtm').
+        history (dict): Frames returned by `synthetic_history`.
+
+    Returns:
+        tuple: List of frames in merge order, and the weather frame.
+    """
+    dam, rtm = history['dam'], history['rtm']
+    weather, hydro, solar, wind = [history[location_type] for location_type in ['weather', 'hydro', 'solar', 'wind']]
+    if market_type == 'dam':
+        rtm = featured_data.shift_date(rtm, 1)
+        weather, hydro, solar, wind = [featured_data.shift_date(df, -1) for df in [weather, hydro, solar, wind]]
+        return [dam, rtm, weather, hydro, solar, wind], weather
+    dam = featured_data.shift_date(dam, 1)
+    weather, hydro, solar, wind = [featured_data.shift_date(df, 2) for df in [weather, hydro, solar, wind]]
+    return [rtm, dam, weather, hydro, solar, wind], weather
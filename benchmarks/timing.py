@@ -0,0 +1,77 @@
+'''
+This script times pipeline stages and tracks the memory they allocate, for the offline benchmarks.
+It includes a class `Benchmark` which runs a stage, records its wall time and peak traced memory, and
+reports or appends the records to a CSV file so that runs can be compared over time.
+
+Author: Aman Bhatt
+'''
+
+import os
+import gc
+import time
+import tracemalloc
+import pandas as pd
+
+
+class Benchmark:
+    def __init__(self, track_memory=True):
+        """
+        Initializes the Benchmark.
+
+        Args:
+            track_memory (bool): Whether to trace allocations; tracing slows allocation-heavy stages down,
+                                 so timings of runs with and without it are not comparable.
+        """
+        self.track_memory = track_memory
+        self.records = []
+        self.labels = {}
+
+    def set_labels(self, **labels):
+        """
+        Sets the labels (e.g. years, locations, market) stored with every following record.
+        """
+        self.labels = labels
+
+    def measure(self, stage, func, *args, **kwargs):
+        """
+        Runs one stage and records its wall time and peak traced memory.
+
+        Args:
+            stage (str): Name of the stage.
+            func (callable): Function to run.
+            *args, **kwargs: Arguments passed to the function.
+
+        Returns:
+            Result of the function.
+        """
+        gc.collect()
+        if self.track_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1] if self.track_memory else float('nan')
+            if self.track_memory:
+                tracemalloc.stop()
+        self.records.append({**self.labels, 'stage': stage, 'seconds': round(seconds, 4), 'peak_mb': round(peak / 1024**2, 1)})
+        print(f'  {stage}: {seconds:.3f}s, peak {peak / 1024**2:.1f} MB')
+        return result
+
+    def report(self):
+        """
+        Returns the records as a DataFrame.
+        """
+        return pd.DataFrame(self.records)
+
+    def save(self, file_path):
+        """
+        Appends the records to a CSV file, writing the header when the file is new.
+
+        Args:
+            file_path (str): Path of the CSV file.
+        """
+        report = self.report()
+        report.insert(0, 'run', pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'))
+        report.to_csv(file_path, mode='a', index=False, header=not os.path.exists(file_path))
@@ -61,9 +61,13 @@ DATA_PATH = project_paths.data
 RAW_DATA_PATH = os.path.join(project_paths.data, 'raw')
 PROCESSED_DATA_PATH = os.path.join(project_paths.data, 'processed')
 EXTERNAL_DATA_PATH = os.path.join(project_paths.data, 'external')
+STORE_DATA_PATH = os.path.join(PROCESSED_DATA_PATH, 'store')  # month-partitioned processed data
+FEATURES_PATH = os.path.join(PROCESSED_DATA_PATH, 'features')  # persisted feature matrices
 
 # model path
 MODELS_PATH = os.path.join(PROJECT_PATH, 'models')
+TUNING_PATH = os.path.join(MODELS_PATH, 'tuning')  # optuna study journals
+DATASETS_PATH = os.path.join(MODELS_PATH, 'datasets')  # binned LightGBM datasets
 
 # dam forecast path
 FORECAST_PATH = project_paths.forecasts
@@ -0,0 +1,52 @@
+# %%
+"""
+Script to backfill day-ahead and real-time market data for an arbitrary date range.
+
+Usage:
+    python deploy/backfill_data.py --market dam rtm --start 2021-01-01 --end 2024-01-01
+
+Author: Aman Bhatt
+"""
+import time, sys, os
+start_time = time.time()
+import argparse
+os.environ['TZ'] = 'Asia/Calcutta'
+time.tzset()
+
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+# %%
+from src.data_ingestion.iex_data import IexDataFetcher
+from config.paths import LOGS_PATH
+from src.utils import *
+
+data_logs = configure_logger(LOGS_PATH, 'data.log')
+
+parser = argparse.ArgumentParser(description='Backfill IEX market data.')
+parser.add_argument('--market', nargs='+', default=['dam', 'rtm'], choices=['dam', 'rtm'])
+parser.add_argument('--start', required=True, help='First day to fetch (YYYY-MM-DD).')
+parser.add_argument('--end', required=True, help='Day after the last day to fetch (YYYY-MM-DD).')
+parser.add_argument('--window-days', type=int, default=30, help='Days requested per API call.')
+parser.add_argument('--workers', type=int, default=4, help='Windows fetched concurrently.')
+parser.add_argument('--rate', type=float, default=2, help='Maximum requests per second (0 for no limit).')
+args = parser.parse_args()
+
+data_logs.info('Data backfill script running from %s to %s.', args.start, args.end)
+
+iex_data = IexDataFetcher()
+
+# %%
+for market_type in args.market:
+    iex_data.backfill(market_type, args.start, args.end, window_days=args.window_days,
+                      max_workers=args.workers, requests_per_second=args.rate)
+
+# %%
+end_time = time.time()
+total_time = (end_time - start_time)/60
+print(f'Time to backfill data: {total_time:.2f} minutes.')
+data_logs.info('Time to backfill data: %.2f minutes.', total_time)
+data_logs.info('**********************************************\n')
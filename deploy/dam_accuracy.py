@@ -26,8 +26,10 @@ sys.path.append(PROJECT_PATH)
 
 # %%
 from src.data_ingestion.iex_data import IexDataFetcher
+from src.data_storage.partitioned_store import processed_store
 from src.get_apis.get_forecast import IexForecast
 from src.feature_engineering.build_features import FeatureEngineering
+from src.model_building.accuracy_report import AccuracyReport
 from src.utils import *
 from config.paths import *
 
@@ -36,13 +38,15 @@ accuracy_logs = configure_logger(LOGS_PATH, 'accuracy.log')
 iex_data = IexDataFetcher()
 iex_forecast = IexForecast()
 featured_data = FeatureEngineering(PROJECT_PATH)
+accuracy_report = AccuracyReport()
 
 # %%
 market_type = 'dam'
 
 accuracy_logs.info('%s accuracy script running.', market_type)
 # %%
-actual = iex_data._get_processed_data(f'{market_type}')[['datetime', f'mcp_{market_type}']]
+iex_data._get_processed_data(market_type)
+actual = processed_store(f'{market_type}_data').load(columns=[f'mcp_{market_type}'])
 
 # %%
 acc_report = load_pickle(REPORTS_PATH, f'{market_type}_accuracy_report')
@@ -57,42 +61,7 @@ try:
     df = featured_data.merge_dataframes([forecast, actual])
 
 # %%
-    unique_dates = df['datetime'].dt.date.unique()
-    acc_data = []
-
-    # %%
-    night_hours = [[x for x in range(0, 6*4)] + [y for y in range(23*4, 24*4)]]
-    morning_hours = [[x for x in range(6*4, 10*4)]]
-    day_hours = [[x for x in range(10*4, 17*4)]]
-    evening_hours = [[x for x in range(17*4, 23*4)]]
-
-    hours = morning_hours + day_hours + evening_hours + night_hours
-
-    # %%
-    for curr_date in unique_dates:
-        curr_date_str = curr_date.strftime("%d-%m-%Y")
-        datas = [curr_date.strftime("%d-%m-%Y")]
-
-        filtered_df = df[df['datetime'].dt.date == curr_date]
-        filtered_df = filtered_df.reset_index(drop=True)
-
-        MAEs = []
-        for x in hours:
-            mae = np.round(np.abs(filtered_df.loc[x]['forecast'] - filtered_df.loc[x]['mcp_dam']).mean(), 2)
-            MAEs.append(mae)
-
-        # Total MAE for the day
-        day_MAE = np.round(np.abs(filtered_df['forecast'] - filtered_df['mcp_dam']).mean(), 2)
-
-        # MAPE of the forecast
-        MAPE = np.round((np.abs(filtered_df['forecast'] - filtered_df['mcp_dam']) / filtered_df['mcp_dam']).mean() * 100, 2)
-
-        datas.extend([day_MAE] + MAEs + [MAPE])
-        acc_data.append(datas)
-
-    # %%
-    curr_acc = pd.DataFrame(data = acc_data, columns = ['Date','MAE','Morning_MAE','Day_MAE',
-                                                    'Evening_MAE','Night_MAE','MAPE'])
+    curr_acc = accuracy_report.price_accuracy(df, market_type)
     curr_acc
 
     # %%
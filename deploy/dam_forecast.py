@@ -31,6 +31,7 @@ plt.rcParams['figure.figsize'] = (12, 6)
 from src.data_ingestion.iex_data import IexDataFetcher
 from src.data_ingestion.weather_data import WeatherDataFetcher
 from src.feature_engineering.build_features import FeatureEngineering
+from src.feature_engineering.feature_store import FeatureStore
 from src.model_building.forecast_model import ModelForecaster
 from src.db_insertion.db_insertion import DAMInsertion
 from src.utils import *
@@ -46,6 +47,7 @@ iex_data = IexDataFetcher()
 weather_data = WeatherDataFetcher()
 
 featured_data = FeatureEngineering(PROJECT_PATH)
+feature_store = FeatureStore(FEATURES_PATH, market_type, featured_data)
 forecasting = ModelForecaster(MODELS_PATH, market_type) 
 db_insert = DAMInsertion() 
 
@@ -58,16 +60,19 @@ db_insert = DAMInsertion()
 # solar = weather_data._get_processed_weather('solar')
 
 # %%
-dam = load_pickle(PROCESSED_DATA_PATH, 'dam_data')
-rtm = load_pickle(PROCESSED_DATA_PATH, 'rtm_data')
-weather = load_pickle(PROCESSED_DATA_PATH, 'weather_data')
-wind = load_pickle(PROCESSED_DATA_PATH, 'wind_data')
-hydro = load_pickle(PROCESSED_DATA_PATH, 'hydro_data')
-solar = load_pickle(PROCESSED_DATA_PATH, 'solar_data')
+dam = load_mmap(PROCESSED_DATA_PATH, 'dam_data')
+rtm = load_mmap(PROCESSED_DATA_PATH, 'rtm_data')
+weather = load_mmap(PROCESSED_DATA_PATH, 'weather_data')
+wind = load_mmap(PROCESSED_DATA_PATH, 'wind_data')
+hydro = load_mmap(PROCESSED_DATA_PATH, 'hydro_data')
+solar = load_mmap(PROCESSED_DATA_PATH, 'solar_data')
 holidays = featured_data.process_holidays(load_pickle(EXTERNAL_DATA_PATH, 'holidays_data'))
 print('Data loaded.')
 forecasting_logs.info('Data loaded.')
 # %%
+# weather features are shared with the other market and computed once per data version, before the market offset
+weather_block = featured_data.shift_date(featured_data.weather_block(weather, hydro), -1)
+
 rtm = featured_data.shift_date(rtm, 1) 
 weather = featured_data.shift_date(weather, -1)
 hydro = featured_data.shift_date(hydro, -1) 
@@ -79,7 +84,9 @@ holidays = holidays.rename(columns = {'holiday': 'holiday_next_day'})
 data = featured_data.merge_dataframes([dam, rtm, weather, hydro, solar, wind])
 
 # %%
-data = featured_data._get_features(data, weather, market_type, task = 'inference')
+# features are computed only for rows added since the last run; the forecast needs the last day
+feature_store.update(data, weather, weather_block)
+data = feature_store.load(start_date = data['datetime'].max().normalize(), columns = forecasting.best_features)
 
 # %%
 print(f'Features created for {market_type}.')
@@ -38,6 +38,7 @@ training_logs = configure_logger(LOGS_PATH, 'training.log')
 from src.data_ingestion.iex_data import IexDataFetcher
 from src.data_ingestion.weather_data import WeatherDataFetcher
 from src.feature_engineering.build_features import FeatureEngineering
+from src.feature_engineering.feature_store import FeatureStore
 from src.model_building.train_model import ModelTraining
 from src.model_building.eval_model import ModelEvaluator
 
@@ -47,6 +48,7 @@ iex_data = IexDataFetcher()
 weather_data = WeatherDataFetcher()
 
 featured_data = FeatureEngineering(PROJECT_PATH) 
+feature_store = FeatureStore(FEATURES_PATH, 'dam', featured_data)
 build_model = ModelTraining(PROJECT_PATH)
 
 # %%
@@ -66,12 +68,12 @@ training_logs.info('%s training script running.', market_type)
 # solar = weather_data._get_processed_weather('solar')
 
 # %%
-dam = load_pickle(PROCESSED_DATA_PATH, 'dam_data')
-rtm = load_pickle(PROCESSED_DATA_PATH, 'rtm_data')
-weather = load_pickle(PROCESSED_DATA_PATH, 'weather_data')
-wind = load_pickle(PROCESSED_DATA_PATH, 'wind_data')
-hydro = load_pickle(PROCESSED_DATA_PATH, 'hydro_data')
-solar = load_pickle(PROCESSED_DATA_PATH, 'solar_data')
+dam = load_mmap(PROCESSED_DATA_PATH, 'dam_data')
+rtm = load_mmap(PROCESSED_DATA_PATH, 'rtm_data')
+weather = load_mmap(PROCESSED_DATA_PATH, 'weather_data')
+wind = load_mmap(PROCESSED_DATA_PATH, 'wind_data')
+hydro = load_mmap(PROCESSED_DATA_PATH, 'hydro_data')
+solar = load_mmap(PROCESSED_DATA_PATH, 'solar_data')
 holidays = featured_data.process_holidays(load_pickle(EXTERNAL_DATA_PATH, 'holidays_data'))
 print('Data loaded.')
 training_logs.info('Data loaded.')
@@ -79,6 +81,9 @@ training_logs.info('Data loaded.')
 # ### Feature Engineering
 
 # %%
+# weather features are shared with the other market and computed once per data version, before the market offset
+weather_block = featured_data.shift_date(featured_data.weather_block(weather, hydro), -1)
+
 rtm = featured_data.shift_date(rtm, 1) 
 weather = featured_data.shift_date(weather, -1)
 hydro = featured_data.shift_date(hydro, -1) 
@@ -90,7 +95,9 @@ holidays = holidays.rename(columns = {'holiday': 'holiday_next_day'})
 data = featured_data.merge_dataframes([dam, rtm, weather, hydro, solar, wind])
 
 # %%
-training_data = featured_data._get_features(data, weather, market_type)
+# features are computed only for rows added since the last run
+feature_store.update(data, weather, weather_block)
+training_data = feature_store.load_training()
 
 # %%
 print(f'Features created for {market_type} training.')
@@ -104,7 +111,11 @@ n_trials = 50
 n_features = 10
 
 # %%
-best_features, best_params = build_model._features_n_params(training_data, n_trials, n_features)
+# trials run in parallel; a run interrupted on the same day resumes the stored study, and the search
+# starts from the previous run's best configurations, shrinking or skipping it when the data drifted little
+study_name = f'{market_type}_{datetime.now().strftime("%Y-%m-%d")}'
+best_features, best_params = build_model._features_n_params(training_data, n_trials, n_features, study_name = study_name,
+                                                            warm_start = market_type)
 print('Best features: ', best_features)
 training_logs.info('Best features: %s', best_features)
 # %%
@@ -142,22 +153,13 @@ validation_upto = datetime.now().date().strftime('%Y-%m-%d')
 X_train, y_train, X_test, y_test, X_valid, y_valid = build_model._split_data(training_data, training_upto, validation_upto)
 
 # %%
-model = build_model._train_model(X_train, y_train, best_params, best_features, objective = 'regression')
-save_pickle(model, MODELS_PATH, f'{market_type}_forecast')
-print(f'{market_type}_forecast model saved.')
-training_logs.info('%s_forecast model saved.', market_type)
-
-# %%
-lower_model = build_model._train_model(X_train, y_train, best_params, best_features, objective = 'quantile', alpha = 0.1)
-save_pickle(lower_model, MODELS_PATH, f'{market_type}_lower')
-print(f'{market_type}_lower model saved.')
-training_logs.info('%s_lower model saved.', market_type)
-
-# %%
-upper_model = build_model._train_model(X_train, y_train, best_params, best_features, objective = 'quantile', alpha = 0.9)
-save_pickle(upper_model, MODELS_PATH, f'{market_type}_upper')
-print(f'{market_type}_upper model saved.')
-training_logs.info('%s_upper model saved.', market_type)
+# point and quantile models are trained together, each with a share of the cores
+models = build_model.train_models(X_train, y_train, best_params, best_features,
+                                  objectives = {'forecast': ('regression', None), 'lower': ('quantile', 0.1), 'upper': ('quantile', 0.9)})
+for name, model in models.items():
+    save_pickle(model, MODELS_PATH, f'{market_type}_{name}')
+    print(f'{market_type}_{name} model saved.')
+    training_logs.info('%s_%s model saved.', market_type, name)
 # %%
 end_time = time.time()
 total_time = (end_time - start_time)/60
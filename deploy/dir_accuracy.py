@@ -24,8 +24,10 @@ sys.path.append(PROJECT_PATH)
 
 # %%
 from src.data_ingestion.iex_data import IexDataFetcher
+from src.data_storage.partitioned_store import processed_store
 from src.get_apis.get_forecast import IexForecast
 from src.feature_engineering.build_features import FeatureEngineering
+from src.model_building.accuracy_report import AccuracyReport
 from src.utils import *
 from config.paths import *
 
@@ -35,24 +37,24 @@ accuracy_logs = configure_logger(LOGS_PATH, 'accuracy.log')
 iex_data = IexDataFetcher()
 iex_forecast = IexForecast()
 featured_data = FeatureEngineering(PROJECT_PATH)
+accuracy_report = AccuracyReport()
 
 # %%
 market_type = 'rtm'
 accuracy_logs.info('%s accuracy script running.', market_type)
 # %%
-dam_actual = iex_data._get_processed_data('dam')[['datetime', f'mcp_dam']]
-rtm_actual = iex_data._get_processed_data('rtm')[['datetime', f'mcp_rtm']]
+iex_data._get_processed_data('dam')
+iex_data._get_processed_data('rtm')
+dam_actual = processed_store('dam_data').load(columns=['mcp_dam'])
+rtm_actual = processed_store('rtm_data').load(columns=['mcp_rtm'])
 
 rtm_actual = rtm_actual[rtm_actual['datetime'].dt.date < datetime.now().date()]
 # %%
 dam_rtm_actual = featured_data.merge_dataframes([rtm_actual, dam_actual])
-dam_rtm_actual['actual'] = -1  # Initialize with -1 for cases where mcp_dam is equal to mcp_rtm
-
-# Update 'actual' based on conditions
-dam_rtm_actual['actual'] = dam_rtm_actual.apply(lambda row: 1 if row['mcp_dam'] > row['mcp_rtm'] else (0 if row['mcp_dam'] < row['mcp_rtm'] else -1), axis=1)
 
 # %%
-dir_actual = dam_rtm_actual[['datetime', 'actual']]
+# 1 when mcp_dam is above mcp_rtm, 0 when below and -1 when equal
+dir_actual = accuracy_report.directional_actual(dam_rtm_actual)
 
 # %%
 acc_report = load_pickle(REPORTS_PATH, 'dir_accuracy_report')
@@ -66,11 +68,9 @@ try:
     forecast = iex_forecast._get_processed_forecast(sdt, tdt, market_type)
 
     df = featured_data.merge_dataframes([forecast, dir_actual])
-    df['Accuracy'] = (df['actual'] == df['forecast']).astype(int)
-    df['Date'] = df['datetime'].dt.date
 
     # %%
-    curr_acc = df.groupby(df['Date'])['Accuracy'].sum().reset_index()
+    curr_acc = accuracy_report.directional_accuracy(df)
 
     # %%
     acc = pd.concat([acc_report, curr_acc], ignore_index = True)
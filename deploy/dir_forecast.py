@@ -58,12 +58,12 @@ db_insert = DirInsertion()
 # solar = weather_data._get_processed_weather('solar')
 
 # %%
-dam = load_pickle(PROCESSED_DATA_PATH, 'dam_data')
-rtm = load_pickle(PROCESSED_DATA_PATH, 'rtm_data')
-weather = load_pickle(PROCESSED_DATA_PATH, 'weather_data')
-wind = load_pickle(PROCESSED_DATA_PATH, 'wind_data')
-hydro = load_pickle(PROCESSED_DATA_PATH, 'hydro_data')
-solar = load_pickle(PROCESSED_DATA_PATH, 'solar_data')
+dam = load_mmap(PROCESSED_DATA_PATH, 'dam_data')
+rtm = load_mmap(PROCESSED_DATA_PATH, 'rtm_data')
+weather = load_mmap(PROCESSED_DATA_PATH, 'weather_data')
+wind = load_mmap(PROCESSED_DATA_PATH, 'wind_data')
+hydro = load_mmap(PROCESSED_DATA_PATH, 'hydro_data')
+solar = load_mmap(PROCESSED_DATA_PATH, 'solar_data')
 holidays = featured_data.process_holidays(load_pickle(EXTERNAL_DATA_PATH, 'holidays_data'))
 print('Data loaded.')
 forecasting_logs.info('Data loaded.')
@@ -79,10 +79,13 @@ wind = featured_data.shift_date(wind, 2)
 holidays = featured_data.shift_date(holidays, -2) 
 holidays = holidays.rename(columns = {'holiday': 'holiday_next_day'})
 
+# only the look-back window of the inputs is needed for the forecast day
+rtm, dam, weather, hydro, solar, wind = featured_data._slice_inference_inputs([rtm, dam, weather, hydro, solar, wind])
 data = featured_data.merge_dataframes([rtm, dam, weather, hydro, solar, wind])
 
 # %%
-data = featured_data._get_features(data, weather, market_type, task = 'inference')
+# only the model's features and their inputs are computed
+data = featured_data._get_inference_features(data, weather, market_type, features = forecasting.best_features)
 
 # %%
 print(f'Features created for {market_type}.')
@@ -66,12 +66,12 @@ training_logs.info('%s training script running.', market_type)
 # solar = weather_data._get_processed_weather('solar')
 
 # %%
-dam = load_pickle(PROCESSED_DATA_PATH, 'dam_data')
-rtm = load_pickle(PROCESSED_DATA_PATH, 'rtm_data')
-weather = load_pickle(PROCESSED_DATA_PATH, 'weather_data')
-wind = load_pickle(PROCESSED_DATA_PATH, 'wind_data')
-hydro = load_pickle(PROCESSED_DATA_PATH, 'hydro_data')
-solar = load_pickle(PROCESSED_DATA_PATH, 'solar_data')
+dam = load_mmap(PROCESSED_DATA_PATH, 'dam_data')
+rtm = load_mmap(PROCESSED_DATA_PATH, 'rtm_data')
+weather = load_mmap(PROCESSED_DATA_PATH, 'weather_data')
+wind = load_mmap(PROCESSED_DATA_PATH, 'wind_data')
+hydro = load_mmap(PROCESSED_DATA_PATH, 'hydro_data')
+solar = load_mmap(PROCESSED_DATA_PATH, 'solar_data')
 holidays = featured_data.process_holidays(load_pickle(EXTERNAL_DATA_PATH, 'holidays_data'))
 print('Data loaded.')
 training_logs.info('Data loaded.')
@@ -82,6 +82,9 @@ rtm = rtm[rtm['datetime'] < datetime.now().strftime('%Y-%m-%d')]
 # ### Feature Engineering
 
 # %%
+# weather features are shared with the other market and computed once per data version, before the market offset
+weather_block = featured_data.shift_date(featured_data.weather_block(weather, hydro), 2)
+
 dam = featured_data.shift_date(dam, 1) 
 weather = featured_data.shift_date(weather, 2)
 hydro = featured_data.shift_date(hydro, 2) 
@@ -93,7 +96,7 @@ holidays = holidays.rename(columns = {'holiday': 'holiday_next_day'})
 data = featured_data.merge_dataframes([rtm, dam, weather, hydro, solar, wind])
 
 # %%
-training_data = featured_data._get_features(data, weather, market_type)
+training_data = featured_data._get_features(data, weather, market_type, weather_block = weather_block)
 
 # %%
 print('Features created.')
@@ -107,7 +110,11 @@ n_trials = 50
 n_features = 10
 
 # %%
-best_features, best_params = build_model._features_n_params(training_data, n_trials, n_features)
+# trials run in parallel; a run interrupted on the same day resumes the stored study, and the search
+# starts from the previous run's best configurations, shrinking or skipping it when the data drifted little
+study_name = f'{market_type}_{datetime.now().strftime("%Y-%m-%d")}'
+best_features, best_params = build_model._features_n_params(training_data, n_trials, n_features, study_name = study_name,
+                                                            warm_start = market_type)
 print('Best features: ', best_features)
 training_logs.info('Best features: %s', best_features)
 # %%
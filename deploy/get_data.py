@@ -18,6 +18,9 @@ sys.path.append(PROJECT_PATH)
 # %%
 from src.data_ingestion.iex_data import IexDataFetcher
 from src.data_ingestion.weather_data import WeatherDataFetcher
+from src.data_ingestion.gap_planner import GapPlanner
+from src.data_storage.partitioned_store import processed_store
+from src.pipeline.task_runner import TaskRunner
 from config.paths import LOGS_PATH
 from src.utils import *
 
@@ -25,24 +28,52 @@ data_logs = configure_logger(LOGS_PATH, 'data.log')
 data_logs.info('Data fretching script running.')
 
 iex_data = IexDataFetcher()
-weather_data = WeatherDataFetcher()
 
 # %%
-dam = iex_data._get_processed_data('dam')
-data_logs.info('dam data uptated upto: %s', dam['datetime'].iloc[-1])
+def fetch_market(market_type):
+    last_timestamp = iex_data._get_processed_data(market_type)
+    if last_timestamp is None:
+        raise RuntimeError(f'{market_type} data not updated')
+    data_logs.info('%s data uptated upto: %s', market_type, last_timestamp)
+    return last_timestamp
 
-rtm = iex_data._get_processed_data('rtm')
-data_logs.info('rtm data uptated upto: %s', rtm['datetime'].iloc[-1])
+def fetch_weather(location_type):
+    # one fetcher per stage so that each stage gets its own connection pool
+    last_timestamp = WeatherDataFetcher()._get_processed_weather(location_type)
+    if last_timestamp is None:
+        raise RuntimeError(f'{location_type} data not updated')
+    return last_timestamp
 
-weather = weather_data._get_processed_weather('weather')
-wind = weather_data._get_processed_weather('wind')
-hydro = weather_data._get_processed_weather('hydro')
-solar = weather_data._get_processed_weather('solar')
+def repair_market(market_type):
+    missing = iex_data.repair_gaps(market_type)
+    if missing is None:
+        raise RuntimeError(f'{market_type} gaps not repaired')
+    return missing
 
+def report_weather_gaps(location_type):
+    # the weather api only serves forecasts, so holes can be reported but not refetched
+    datetimes = processed_store(f'{location_type}_data').load(mmap_mode='r')['datetime']
+    missing = GapPlanner().missing_slots(datetimes)
+    if len(missing):
+        data_logs.warning('%s data: %s missing slots on %s days.', location_type, len(missing), missing.normalize().nunique())
+    return missing
+
+# %%
+# the sources share no data, so every fetch-and-process stage runs concurrently
+runner = TaskRunner(data_logs)
+for market_type in ['dam', 'rtm']:
+    runner.add_task(market_type, lambda market_type=market_type: fetch_market(market_type))
+    runner.add_task(f'{market_type}_gaps', lambda market_type=market_type, **_: repair_market(market_type), depends_on=[market_type])
+for location_type in ['weather', 'wind', 'hydro', 'solar']:
+    runner.add_task(location_type, lambda location_type=location_type: fetch_weather(location_type))
+    runner.add_task(f'{location_type}_gaps', lambda location_type=location_type, **_: report_weather_gaps(location_type),
+                    depends_on=[location_type])
+
+results = runner.run()
 
 # %%
 end_time = time.time()
 total_time = (end_time - start_time)/60
 print(f'Time to fetch data: {total_time:.2f} minutes.')
 data_logs.info('Time to fetch data: %.2f minutes.', total_time)
-data_logs.info('**********************************************\n')
\ No newline at end of file
+data_logs.info('**********************************************\n')
@@ -0,0 +1,124 @@
+'''
+This script finds holes in stored 15-minute series and plans the minimal set of API windows to refill them.
+It includes a class `GapPlanner` which indexes stored datetimes against the expected 96-slot-per-day grid,
+reading only the partitions of a store whose manifest counts show a hole.
+
+Author: Aman Bhatt
+'''
+
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+
+class GapPlanner:
+    def __init__(self, slots_per_day=96):
+        """
+        Initializes the GapPlanner.
+
+        Args:
+            slots_per_day (int): Number of slots in a day of the grid (96 for 15-minute data).
+        """
+        self.slots_per_day = slots_per_day
+        self.step = np.int64(24 * 60 * 60 * 10**9 // slots_per_day)
+
+    def missing_slots(self, datetimes, start_date=None, end_date=None):
+        """
+        Finds the grid slots that have no stored row.
+
+        Args:
+            datetimes (array-like): Stored datetimes.
+            start_date (str or datetime): First day expected (defaults to the first stored day).
+            end_date (str or datetime): Slot to check up to, excluded (defaults to just after the last stored slot).
+
+        Returns:
+            pd.DatetimeIndex: Missing slots.
+        """
+        stored = pd.to_datetime(pd.Series(datetimes)).to_numpy(dtype='datetime64[ns]').view('int64')
+        if len(stored) == 0:
+            return pd.DatetimeIndex([])
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else pd.Timestamp(stored.min()).normalize()
+        end = pd.Timestamp(end_date) if end_date is not None else pd.Timestamp(stored.max()) + pd.Timedelta(self.step)
+        origin, n_slots = start.value, (end.value - start.value) // self.step
+
+        # mark every stored slot on a boolean grid; whatever stays unmarked is missing
+        present = np.zeros(max(n_slots, 0), dtype=bool)
+        slots = (stored - origin) // self.step
+        slots = slots[(slots >= 0) & (slots < n_slots) & ((stored - origin) % self.step == 0)]
+        present[slots] = True
+        return pd.DatetimeIndex((origin + np.flatnonzero(~present) * self.step).view('datetime64[ns]'))
+
+    def missing_in_store(self, store, start_date=None):
+        """
+        Finds the grid slots missing from a partitioned store. Holes between partitions and partitions whose
+        row count matches their first-to-last span are found from the manifest alone; only the datetime column
+        of the remaining partitions is read. Stored rows are assumed to lie on the grid, as API rows do.
+
+        Args:
+            store (PartitionedStore): Store of a 15-minute series.
+            start_date (str or datetime): First day expected (defaults to the first stored day).
+
+        Returns:
+            pd.DatetimeIndex: Missing slots, up to the last stored slot.
+        """
+        partitions = store.partitions()
+        if not partitions:
+            return pd.DatetimeIndex([])
+        step = pd.Timedelta(int(self.step))
+        start = pd.Timestamp(start_date if start_date is not None else next(iter(partitions.values()))['first']).normalize()
+
+        missing, expected = [], start
+        for info in partitions.values():
+            first, last = pd.Timestamp(info['first']), pd.Timestamp(info['last'])
+            if last < start:
+                continue
+            if first > expected:
+                # slots between the previous partition (or the start) and this one
+                missing.append(pd.date_range(expected, first - step, freq=step))
+            span_start = max(first, start)
+            on_grid = (span_start - start) % step == pd.Timedelta(0) and (last - start) % step == pd.Timedelta(0)
+            if not (first >= start and on_grid and info['rows'] == (last - first) // step + 1):
+                datetimes = store.load(span_start, last + step, mmap_mode='r', columns=[])['datetime']
+                missing.append(self.missing_slots(datetimes, span_start, last + step))
+            expected = max(expected, last + step)
+
+        if not missing:
+            return pd.DatetimeIndex([])
+        # the day of a partition starting mid-day is also checked from its midnight, so drop the overlap
+        return pd.DatetimeIndex(np.concatenate([slots.to_numpy(dtype='datetime64[ns]') for slots in missing])).unique().sort_values()
+
+    def plan_windows(self, missing, window_days=30):
+        """
+        Coalesces missing slots into whole-day windows of at most `window_days` days.
+
+        Args:
+            missing (pd.DatetimeIndex): Missing slots.
+            window_days (int): Maximum number of days requested per API call.
+
+        Returns:
+            list: List of (window start, window end) timestamps covering every missing day, in order.
+        """
+        days = pd.DatetimeIndex(missing).normalize().unique().sort_values()
+        windows = []
+        for day in days:
+            if windows and windows[-1][1] == day and (windows[-1][1] - windows[-1][0]).days < window_days:
+                windows[-1] = (windows[-1][0], day + timedelta(days=1))
+            else:
+                windows.append((day, day + timedelta(days=1)))
+        return windows
+
+    def plan(self, datetimes, start_date=None, end_date=None, window_days=30):
+        """
+        Computes the minimal set of windows needed to fill every hole of a stored series.
+
+        Args:
+            datetimes (array-like): Stored datetimes.
+            start_date (str or datetime): First day expected.
+            end_date (str or datetime): Slot to check up to, excluded.
+            window_days (int): Maximum number of days requested per API call.
+
+        Returns:
+            tuple: Missing slots and the windows to fetch.
+        """
+        missing = self.missing_slots(datetimes, start_date, end_date)
+        return missing, self.plan_windows(missing, window_days)
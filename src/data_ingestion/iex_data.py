@@ -1,5 +1,5 @@
 '''
-This script fetches market data from the IEX API, processes it, and stores it in pickle files.
+This script fetches market data from the IEX API, processes it, and stores it in the partitioned data store.
 It includes a class `IexDataFetcher` with methods to retrieve raw market data (dam and rtm), process it, and save the results.
 
 Author: Aman Bhatt
@@ -8,9 +8,9 @@ Author: Aman Bhatt
 import os
 import time
 import sys
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -23,45 +23,40 @@ sys.path.append(PROJECT_PATH)
 # Custom modules
 from config.paths import *
 from src.utils import *
+from src.get_apis.iex_client import get_iex_client, RateLimiter
+from src.data_storage.partitioned_store import processed_store
+from src.data_ingestion.gap_planner import GapPlanner
 
 data_logs = configure_logger(LOGS_PATH, 'data.log')
 
 class IexDataFetcher:
     def __init__(self):
-        # api credentials
-        self.base_url = os.getenv('base_url')
-        self.user_email = os.getenv('email')
-        self.user_password = os.getenv('password')
+        # shared api client (credentials, cached token and pooled connections)
+        self.client = get_iex_client()
 
     def _get_token(self):
         """
-        Retrieves the access token by sending a POST request to the IEX API login endpoint.
+        Retrieves the access token from the shared IEX client, logging in only when the cached token has expired.
         """
         try:
-            url = self.base_url + 'login'
-            data = {'email': self.user_email, 'password': self.user_password}
-            req = requests.post(url=url, data=data, verify=True).json()
-            return req['access_token']
+            return self.client.get_token()
         except Exception as e:
             print("Error occurred while retrieving the access token:", str(e))
             data_logs.error("Error in retrieving the access token: %s", str(e))
 
-    def _get_market_data(self, start_date_str, end_date_str, token, market_type):
+    def _get_market_data(self, start_date_str, end_date_str, market_type):
         """
         Fetches market data from the IEX API based on specified parameters.
         
         Args:
             start_date_str (str): Start date string.
             end_date_str (str): End date string.
-            token (str): Access token.
             market_type (str): Type of market data ('dam' or 'rtm').
         """
         try:
             endpoint = 'getMarketVolume' if market_type == 'dam' else 'getRTMMarketVolume'
-            url = self.base_url + endpoint
-            headers = {'Authorization': 'Bearer ' + token, 'Content-Type': 'application/json'}
             params = {"start_date": start_date_str, "end_date": end_date_str}
-            r = requests.get(url=url, headers=headers, params=params)
+            r = self.client.get(endpoint, params=params)
             return r.json()
         except Exception as e:
             print(f"Error occurred while retrieving json data for {market_type}:", str(e))
@@ -76,15 +71,16 @@ class IexDataFetcher:
             
         Returns:
             Tuple: Tuple containing start date, end date, start date string,
-                   end date string, and historical data.
+                   end date string, and the last stored timestamp.
         """
         try:
-            data_historical = load_pickle(PROCESSED_DATA_PATH, f'{market_type}_data')
-            start_date = data_historical['datetime'].iloc[-1] + timedelta(hours=0.25)
+            # the manifest holds the last timestamp, no partition has to be read
+            last_timestamp = processed_store(f'{market_type}_data').last_timestamp()
+            start_date = last_timestamp + timedelta(hours=0.25)
             end_date = start_date + timedelta(days=30)
             start_date_str = start_date.strftime("%d-%m-%Y")
             end_date_str = end_date.strftime("%d-%m-%Y")
-            return start_date, end_date, start_date_str, end_date_str, data_historical
+            return start_date, end_date, start_date_str, end_date_str, last_timestamp
         except Exception as e:
             print(f"Error while creating datetime variables for {market_type} data.:", str(e))
             data_logs.error("Error while creating datetime variables for %s data: %s", market_type, str(e))
@@ -100,12 +96,11 @@ class IexDataFetcher:
             pd.DataFrame: Raw market data.
         """
         try:
-            token = self._get_token()
-            start_date, end_date, start_date_str, end_date_str, data_historical = self._get_datetime_variables(market_type)
-            data_dict = self._get_market_data(start_date_str, end_date_str, token, market_type)
+            start_date, end_date, start_date_str, end_date_str, last_timestamp = self._get_datetime_variables(market_type)
+            data_dict = self._get_market_data(start_date_str, end_date_str, market_type)
             raw_data = pd.DataFrame(data_dict['data'])
             if raw_data.empty:
-                print(f'{market_type} data is already updated up to: ', data_historical['datetime'].iloc[-1])
+                print(f'{market_type} data is already updated up to: ', last_timestamp)
                 return pd.DataFrame()
             else:
                 save_pickle(raw_data, RAW_DATA_PATH, f'{market_type}')
@@ -114,66 +109,226 @@ class IexDataFetcher:
             print("Error in fetching data:", str(e))
             data_logs.error("Error in fetching raw %s data: %s", market_type, str(e))
 
+    def _process_raw_data(self, raw_data, start_date, end_date, market_type):
+        """
+        Converts raw market data of a single request window into processed rows.
+        
+        Args:
+            raw_data (pd.DataFrame): Raw market data returned by the API.
+            start_date (datetime): Start of the requested window.
+            end_date (datetime): End of the requested window.
+            market_type (str): Type of market data ('dam' or 'rtm').
+            
+        Returns:
+            pd.DataFrame: Processed rows of the window.
+        """
+        if market_type == 'dam':
+            # Processing steps for DAM data
+            df = raw_data[['mcp', 'mcv', 'purchase_bid', 'sell_bid']]
+            for column in df.columns:
+                df.loc[:, column] = pd.to_numeric(df[column], errors='coerce').copy()
+            df = df.rename(columns={'mcp': 'mcp_dam', 'mcv': 'clearedvolume_dam',
+                                    'purchase_bid': 'pb_dam', 'sell_bid': 'sb_dam'})
+            df['diff_sb_pb_dam'] = df['pb_dam'] - df['sb_dam']
+            dates = pd.date_range(start=start_date.date(), end=end_date.date(), freq='15min')[:-1]
+            current_dates = pd.DataFrame({'datetime': dates})
+            return pd.concat([current_dates, df], axis=1).dropna()
+
+        # Processing steps for RTM data
+        df = raw_data.copy()
+        df['datetime'] = pd.to_datetime(df['date'], format='%d-%m-%Y') + pd.to_timedelta(df['time_block'].str.split('-').str[0] + ':00')
+        df = df[df['datetime'] >= start_date]
+        df = df[['datetime', 'mcp', 'mcv', 'purchase_bid', 'sell_bid']]
+        for column in df.columns[1:]:
+            df[column] = pd.to_numeric(df[column])
+        df = df.rename(columns={'mcp': 'mcp_rtm', 'mcv': 'clearedvolume_rtm',
+                                'purchase_bid': 'pb_rtm', 'sell_bid': 'sb_rtm'})
+        df['diff_sb_pb_rtm'] = df['pb_rtm'] - df['sb_rtm']
+        return df.copy()
+
     def _get_processed_data(self, market_type):
         """
-        Processes raw market data, creates additional features, and saves the results.
+        Processes raw market data, creates additional features, and appends the new rows to the store.
+        Stored history is not read back; callers load what they need from the store.
         
         Args:
             market_type (str): Type of market data ('DAM' or 'RTM').
             
         Returns:
-            pd.DataFrame: Processed market data.
+            pd.Timestamp: Last stored timestamp after the update.
         """
         try:
-            raw_data = self._get_raw_data(market_type)
-            start_date, end_date, start_date_str, end_date_str, data_historical = self._get_datetime_variables(market_type)
-
-            if market_type == 'dam':
-                # Processing steps for DAM data
-                if not raw_data.empty:
-                    df = raw_data[['mcp', 'mcv', 'purchase_bid', 'sell_bid']]
-                    for column in df.columns:
-                        df.loc[:, column] = pd.to_numeric(df[column], errors='coerce').copy()
-                    df = df.rename(columns={'mcp': 'mcp_dam', 'mcv': 'clearedvolume_dam',
-                                            'purchase_bid': 'pb_dam', 'sell_bid': 'sb_dam'})
-                    df['diff_sb_pb_dam'] = df['pb_dam'] - df['sb_dam']
-                    dates = pd.date_range(start=start_date.date(), end=end_date.date(), freq='15min')[:-1]
-                    current_dates = pd.DataFrame({'datetime': dates})
-                    current_data = pd.concat([current_dates, df], axis=1).dropna()
-                    processed_data = pd.concat([data_historical, current_data]).reset_index(drop=True)
-                    last_date = processed_data['datetime'].iloc[-1].strftime('%d-%m-%Y %H:%M')
-                    print(f'{market_type} data updated up to: ', last_date)
-                    save_pickle(processed_data, PROCESSED_DATA_PATH, f'{market_type}_data')
-                    return processed_data
-                else:
-                    return data_historical
-
-            elif market_type == 'rtm':
-                # Processing steps for RTM data
-                if not raw_data.empty:
-                    df = raw_data.copy()
-                    df['datetime'] = pd.to_datetime(df['date'], format='%d-%m-%Y') + pd.to_timedelta(df['time_block'].str.split('-').str[0] + ':00')
-                    df = df[df['datetime'] >= start_date]
-                    df = df[['datetime', 'mcp', 'mcv', 'purchase_bid', 'sell_bid']]
-                    for column in df.columns[1:]:
-                        df[column] = pd.to_numeric(df[column])
-                    df = df.rename(columns={'mcp': 'mcp_rtm', 'mcv': 'clearedvolume_rtm',
-                                            'purchase_bid': 'pb_rtm', 'sell_bid': 'sb_rtm'})
-                    df['diff_sb_pb_rtm'] = df['pb_rtm'] - df['sb_rtm']
-                    current_data = df.copy()
-                    processed_data = pd.concat([data_historical, current_data]).reset_index(drop=True)
-                    save_pickle(processed_data, PROCESSED_DATA_PATH, f'{market_type}_data') 
-                    last_date = processed_data['datetime'].iloc[-1].strftime('%d-%m-%Y %H:%M')
-                    print(f'{market_type} data updated up to: ', last_date)
-                    return processed_data
-                else:
-                    last_date = data_historical['datetime'].iloc[-1].strftime('%d-%m-%Y %H:%M')
-                    return data_historical 
-                
-            else:
+            if market_type not in ['dam', 'rtm']:
                 print('Use either "dam" or "rtm" to fetch data.')
                 data_logs.warning('Use either "dam" or "rtm" to fetch data.')
+                return
+
+            raw_data = self._get_raw_data(market_type)
+            start_date, end_date, start_date_str, end_date_str, last_timestamp = self._get_datetime_variables(market_type)
+            store = processed_store(f'{market_type}_data')
+
+            if not raw_data.empty:
+                current_data = self._process_raw_data(raw_data, start_date, end_date, market_type)
+                store.append(current_data)
+                last_date = store.last_timestamp().strftime('%d-%m-%Y %H:%M')
+                print(f'{market_type} data updated up to: ', last_date)
+            return store.last_timestamp()
         except Exception as e:
             print("Error in processing data:", str(e)) 
             data_logs.error('Error while processing %s data: %s', market_type, str(e))
-            
\ No newline at end of file
+
+    def _backfill_windows(self, start_date, end_date, window_days=30):
+        """
+        Splits a date range into consecutive API-sized request windows.
+        
+        Args:
+            start_date (str or datetime): First day of the range.
+            end_date (str or datetime): Day after the last day of the range.
+            window_days (int): Number of days requested per API call.
+            
+        Returns:
+            list: List of (window start, window end) timestamps, in order.
+        """
+        start_date = pd.Timestamp(start_date).normalize()
+        end_date = pd.Timestamp(end_date).normalize()
+        window_starts = pd.date_range(start=start_date, end=end_date, freq=f'{window_days}D')
+        return [(window_start, min(window_start + timedelta(days=window_days), end_date))
+                for window_start in window_starts if window_start < end_date]
+
+    def _fetch_window(self, window, market_type, rate_limiter):
+        """
+        Fetches and processes one backfill window.
+        
+        Args:
+            window (tuple): Window start and end timestamps.
+            market_type (str): Type of market data ('dam' or 'rtm').
+            rate_limiter (RateLimiter): Limiter shared by all backfill requests.
+            
+        Returns:
+            pd.DataFrame: Processed rows of the window (empty if the api returned none, None if the request failed).
+        """
+        window_start, window_end = window
+        try:
+            rate_limiter.wait()
+            data_dict = self._get_market_data(window_start.strftime("%d-%m-%Y"), window_end.strftime("%d-%m-%Y"), market_type)
+            raw_data = pd.DataFrame(data_dict['data'])
+            if raw_data.empty:
+                return pd.DataFrame()
+            current_data = self._process_raw_data(raw_data, window_start, window_end, market_type)
+            return current_data[current_data['datetime'] < window_end]
+        except Exception as e:
+            print(f'Error while backfilling {market_type} data from {window_start.date()} to {window_end.date()}:', str(e))
+            data_logs.error('Error while backfilling %s data from %s to %s: %s', market_type, window_start.date(), window_end.date(), str(e))
+            return None
+
+    def _fetch_windows(self, windows, market_type, max_workers=4, requests_per_second=2):
+        """
+        Fetches request windows concurrently under a shared rate limit.
+        
+        Args:
+            windows (list): List of (window start, window end) timestamps.
+            market_type (str): Type of market data ('dam' or 'rtm').
+            max_workers (int): Maximum number of windows fetched concurrently.
+            requests_per_second (float): Rate limit shared by all windows.
+            
+        Returns:
+            tuple: Processed rows of every window that returned data, in window order, and the windows whose
+                   request failed.
+        """
+        rate_limiter = RateLimiter(requests_per_second)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(lambda window: self._fetch_window(window, market_type, rate_limiter), windows))
+
+        fetched = [frame for frame in frames if frame is not None and not frame.empty]
+        failed = [window for window, frame in zip(windows, frames) if frame is None]
+        print(f'{market_type}: {len(fetched)} of {len(windows)} windows fetched, {len(failed)} failed.')
+        data_logs.info('%s: %s of %s windows fetched, %s failed.', market_type, len(fetched), len(windows), len(failed))
+        return fetched, failed
+
+    def backfill(self, market_type, start_date, end_date, window_days=30, max_workers=4, requests_per_second=2):
+        """
+        Fetches an arbitrary date range of market data in concurrent API-sized windows and merges
+        it into the processed data. Backfilled rows replace stored rows with the same datetime.
+        
+        Args:
+            market_type (str): Type of market data ('dam' or 'rtm').
+            start_date (str or datetime): First day to fetch.
+            end_date (str or datetime): Day after the last day to fetch.
+            window_days (int): Number of days requested per API call.
+            max_workers (int): Maximum number of windows fetched concurrently.
+            requests_per_second (float): Rate limit shared by all windows.
+            
+        Returns:
+            pd.Timestamp: Last stored timestamp after the backfill (None when nothing was fetched).
+        """
+        try:
+            windows = self._backfill_windows(start_date, end_date, window_days)
+            fetched, _ = self._fetch_windows(windows, market_type, max_workers, requests_per_second)
+            if not fetched:
+                return
+
+            # merge once, in order; backfilled rows win over stored ones and only touched months are rewritten
+            store = processed_store(f'{market_type}_data')
+            store.upsert(pd.concat(fetched, ignore_index=True))
+            last_date = store.last_timestamp().strftime('%d-%m-%Y %H:%M')
+            print(f'{market_type} data backfilled, updated up to: ', last_date)
+            data_logs.info('%s data backfilled, updated up to: %s', market_type, last_date)
+            return store.last_timestamp()
+        except Exception as e:
+            print(f'Error while backfilling {market_type} data:', str(e))
+            data_logs.error('Error while backfilling %s data: %s', market_type, str(e))
+
+    def repair_gaps(self, market_type, start_date=None, window_days=30, max_workers=4, requests_per_second=2,
+                    retry_unavailable=False):
+        """
+        Finds the slots missing from the stored 15-minute series and refetches only the days that contain them.
+        Slots still missing after being refetched are recorded in the store metadata as unavailable and are
+        not requested again, unless `retry_unavailable` is set.
+        
+        Args:
+            market_type (str): Type of market data ('dam' or 'rtm').
+            start_date (str or datetime): First day to check (defaults to the first stored day).
+            window_days (int): Maximum number of days requested per API call.
+            max_workers (int): Maximum number of windows fetched concurrently.
+            requests_per_second (float): Rate limit shared by all windows.
+            retry_unavailable (bool): Also refetch the slots recorded as unavailable.
+            
+        Returns:
+            pd.DatetimeIndex: Slots that are still missing after the repair, unavailable ones included.
+        """
+        try:
+            store = processed_store(f'{market_type}_data')
+            planner = GapPlanner()
+            # complete partitions are recognised from the manifest; only the others have their datetimes read
+            missing = planner.missing_in_store(store, start_date)
+            unavailable = pd.DatetimeIndex(store.metadata().get('unavailable_slots', []))
+            if retry_unavailable:
+                unavailable = pd.DatetimeIndex([])
+            requested = missing.difference(unavailable)
+            windows = planner.plan_windows(requested, window_days)
+            print(f'{market_type} data: {len(requested)} missing slots in {len(windows)} windows, '
+                  f'{len(missing) - len(requested)} unavailable.')
+            data_logs.info('%s data: %s missing slots in %s windows, %s unavailable.', market_type, len(requested),
+                           len(windows), len(missing) - len(requested))
+            if not windows:
+                return missing
+
+            fetched, failed = self._fetch_windows(windows, market_type, max_workers, requests_per_second)
+            if fetched:
+                # only the fetched days are merged; stored rows elsewhere are not rewritten
+                repaired = pd.concat(fetched, ignore_index=True)
+                store.upsert(repaired[repaired['datetime'].dt.normalize().isin(requested.normalize())])
+            missing = planner.missing_in_store(store, start_date)
+            # slots the api answered without are not asked for again (failed requests are retried next run);
+            # slots filled since, e.g. by a backfill, leave the list
+            answered = requested.intersection(missing)
+            for window_start, window_end in failed:
+                answered = answered[(answered < window_start) | (answered >= window_end)]
+            unavailable = unavailable.union(answered).intersection(missing)
+            store.set_metadata(unavailable_slots=[str(slot) for slot in unavailable])
+            print(f'{market_type} data: {len(missing)} slots still missing after repair.')
+            data_logs.info('%s data: %s slots still missing after repair.', market_type, len(missing))
+            return missing
+        except Exception as e:
+            print(f'Error while repairing {market_type} data:', str(e))
+            data_logs.error('Error while repairing %s data: %s', market_type, str(e))
@@ -1,5 +1,5 @@
 '''
-This script fetches weather data from the Meteoblue API, processes it, and stores it in pickle files.
+This script fetches weather data from the Meteoblue API, processes it, and stores it in the partitioned data store.
 It includes a class `WeatherDataFetcher` with methods to retrieve data, process it, and save the results.
 
 Author: Aman Bhatt
@@ -10,8 +10,11 @@ import os
 import sys
 import yaml
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -28,19 +31,42 @@ sys.path.append(PROJECT_PATH)
 from config.paths import RAW_DATA_PATH, PROCESSED_DATA_PATH
 from src.utils import *
 from config.paths import LOGS_PATH
+from src.data_storage.partitioned_store import processed_store
 
 data_logs = configure_logger(LOGS_PATH, 'data.log')
 
 class WeatherDataFetcher:
-    def __init__(self):
+    def __init__(self, max_workers=None):
         '''
         Initializes the WeatherDataFetcher class with necessary credentials and paths.
+
+        Args:
+        - max_workers: Maximum number of locations fetched concurrently (defaults to the
+          'weather_max_workers' environment variable, or 8). Use 1 to fetch sequentially.
         '''
         # Access credentials
         self.api_key = os.getenv('meteoblue_api_key')
         self.PROJECT_PATH = os.getenv('PROJECT_DIR')
         sys.path.append(self.PROJECT_PATH)
 
+        # Concurrency limit and pooled HTTP session shared by all requests
+        self.max_workers = max(1, int(max_workers or os.getenv('weather_max_workers', 8)))
+        self.session = self._create_session()
+
+    def _create_session(self):
+        '''
+        Creates a requests session whose connection pool is sized to the concurrency limit,
+        so that concurrent requests to Meteoblue reuse keep-alive connections.
+
+        Returns:
+        - requests.Session
+        '''
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def _get_weather_response(self, lat, lon, asl, name):
         '''
         Sends a request to the Meteoblue API for basic 1-hour weather data.
@@ -56,7 +82,7 @@ class WeatherDataFetcher:
         '''
         try:
             url = f"http://my.meteoblue.com/packages/basic-1h?name={name}&lat={lat}&lon={lon}&asl={asl}&tz=UTC&apikey={self.api_key}"
-            response = requests.get(url)
+            response = self.session.get(url)
             data = response.json()
             return data
         except Exception as e:
@@ -78,7 +104,7 @@ class WeatherDataFetcher:
         '''
         try:
             url = f"http://my.meteoblue.com/packages/solar-15min?name={name}&lat={lat}&lon={lon}&asl={asl}&tz=UTC&apikey={self.api_key}"
-            response = requests.get(url)
+            response = self.session.get(url)
             data = response.json()
             return data
 
@@ -86,9 +112,30 @@ class WeatherDataFetcher:
             print("Error occurred while retrieving json data:", str(e))
             data_logs.error("Error occurred while retrieving json data:", str(e)) 
 
+    def _fetch_location(self, location, required_features, location_type):
+        '''
+        Fetches and preprocesses weather data for a single location.
+
+        Args:
+        - location: Location coordinates and name
+        - required_features: List of features to be included in the processed data
+        - location_type: Type of location data ('solar' or other)
+
+        Returns:
+        - Preprocessed weather data DataFrame for the location
+        '''
+        lat, lon, asl, name = location
+        if location_type == 'solar':
+            data_dict = self._get_solar_response(lat, lon, asl, name)
+            df = pd.DataFrame.from_dict(data_dict['data_xmin'])
+        else:
+            data_dict = self._get_weather_response(lat, lon, asl, name)
+            df = pd.DataFrame.from_dict(data_dict['data_1h'])
+        return self._preprocess_weather_data(df, required_features, name)
+
     def _fetch_weather_data(self, locations, required_features, location_type):
         '''
-        Fetches weather data for multiple locations, preprocesses it, and combines into a DataFrame.
+        Fetches weather data for multiple locations concurrently, preprocesses it, and combines into a DataFrame.
 
         Args:
         - locations: List of location coordinates and names
@@ -99,25 +146,16 @@ class WeatherDataFetcher:
         - Combined DataFrame with weather data
         '''
         try:
-            df_combined = pd.DataFrame()
-
-            for location in locations:
-                lat, lon, asl, name = location
-                if location_type == 'solar':
-                    data_dict = self._get_solar_response(lat, lon, asl, name)
-                    df = pd.DataFrame.from_dict(data_dict['data_xmin'])
-                else:
-                    data_dict = self._get_weather_response(lat, lon, asl, name)
-                    df = pd.DataFrame.from_dict(data_dict['data_1h'])
-
-                df = self._preprocess_weather_data(df, required_features, name)
-                df_combined = pd.concat([df_combined, df], ignore_index=True)
-            df_combined = self._resample_and_interpolate(df_combined)
+            # Locations are fetched on a bounded thread pool; results are concatenated once at the end
+            n_workers = min(self.max_workers, len(locations))
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                frames = list(executor.map(lambda location: self._fetch_location(location, required_features, location_type), locations))
+            df_combined = self._resample_and_interpolate(frames)
             save_pickle(df_combined, RAW_DATA_PATH, f'{location_type}')
             return df_combined
         except Exception as e:
             print(f'Error while retrieving {location_type} data: ', str(e))
-            data_logs.error('Errorwhile retrieving %s data: ', location_type, str(e))
+            data_logs.error('Error while retrieving %s data: %s', location_type, str(e))
 
     def _preprocess_weather_data(self, df, required_features, name):
         '''
@@ -142,33 +180,64 @@ class WeatherDataFetcher:
             df = df.rename(columns={'windspeed': 'ws', 'ghi_instant': 'ghi',
                                     'relativehumidity': 'rh', 'winddirection': 'wd',
                                     'temperature': 'temp', 'felttemperature': 'atemp', 'precipitation': 'prec'})
-            df['datetime'] = df['datetime'].astype(str)
             df['location'] = name
             return df
         except Exception as e:
             print(f'Error during preprocessing: ', str(e))
             data_logs.error('Error during preprocessing: ', str(e)) 
 
-    def _resample_and_interpolate(self, df):
+    def _resample_and_interpolate(self, frames):
         '''
         Resamples and interpolates weather data to a 15-minute interval.
+        Timestamps stay int64 throughout: the location x feature matrix is built directly in NumPy
+        and every column is linearly interpolated onto the 15-minute grid in one vectorized pass.
 
         Args:
-        - df: Preprocessed weather data DataFrame
+        - frames: List of preprocessed weather data DataFrames, one per location
 
         Returns:
         - Resampled and interpolated weather data DataFrame
         '''
         try:
-            df = df.pivot(index='datetime', columns='location')
-            df.columns = [f"{col[0]}_{col[1][:3]}" for col in df.columns]
-            df.reset_index(inplace=True)
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df = df.set_index('datetime').resample('15MIN').interpolate(method='linear').reset_index()
+            step = np.int64(15 * 60 * 10**9)
+            frames = sorted(frames, key=lambda df: df['location'].iloc[0])
+            features = [column for column in frames[0].columns if column not in ['datetime', 'location']]
+            n_locations = len(frames)
+
+            # 15-minute grid spanning all locations; only observations on the grid are kept
+            times = [df['datetime'].to_numpy(dtype='datetime64[ns]').view('int64') for df in frames]
+            first = min(t.min() for t in times)
+            last = max(t.max() for t in times)
+            grid = np.arange(first - first % step, last + 1, step)
+
+            # (grid x feature-location) matrix, columns ordered feature-major like the former pivot
+            values = np.full((len(grid), len(features) * n_locations), np.nan)
+            for i, (df, t) in enumerate(zip(frames, times)):
+                on_grid = t % step == 0
+                rows = (t[on_grid] - grid[0]) // step
+                values[rows, i::n_locations] = df[features].to_numpy(dtype='float64')[on_grid]
+
+            # linear interpolation between the previous and next valid points of every column;
+            # leading gaps stay NaN and trailing gaps hold the last valid value
+            valid = ~np.isnan(values)
+            index = np.arange(len(grid))[:, None]
+            prev = np.maximum.accumulate(np.where(valid, index, -1), axis=0)
+            nxt = np.minimum.accumulate(np.where(valid, index, len(grid))[::-1], axis=0)[::-1]
+            nxt = np.where(nxt == len(grid), prev, nxt)
+            prev_values = np.take_along_axis(values, np.maximum(prev, 0), axis=0)
+            next_values = np.take_along_axis(values, np.maximum(nxt, 0), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                slope = (next_values - prev_values) / (nxt - prev)
+                interpolated = np.where(nxt == prev, prev_values, slope * (index - prev) + prev_values)
+            interpolated[prev < 0] = np.nan
+
+            columns = [f"{feature}_{df['location'].iloc[0][:3]}" for feature in features for df in frames]
+            df = pd.DataFrame(interpolated, columns=columns)
+            df.insert(0, 'datetime', grid.view('datetime64[ns]'))
             return df
         except Exception as e:
             print(f'Error during resampling and interpolation: ', str(e))
-            data_logs.error('Error during resampling and interpolation: ', str(e))
+            data_logs.error('Error during resampling and interpolation: %s', str(e))
 
     def _load_locations(self, file_path, location_type):
         '''
@@ -191,13 +260,14 @@ class WeatherDataFetcher:
 
     def _get_processed_weather(self, location_type):
         '''
-        Retrieves processed weather data, updates historical data, and saves the final DataFrame.
+        Retrieves processed weather data and appends it to the store, replacing stored rows from its first timestamp on.
+        Stored history is not read back; callers load what they need from the store.
 
         Args:
         - location_type: Type of location data ('solar' or other)
 
         Returns:
-        - Final DataFrame with updated weather data
+        - Last stored timestamp after the update
         '''
         try:
             # Load weather locations from YAML file
@@ -208,14 +278,12 @@ class WeatherDataFetcher:
 
             raw_df = self._fetch_weather_data(locations['locations'], required_features, location_type)
 
-            start_date = raw_df['datetime'].iloc[0]
-            data_historical = pd.read_pickle(os.path.join(PROCESSED_DATA_PATH, f'{location_type}_data'))
-            data_historical = data_historical[data_historical['datetime'] < start_date]
-            final_df = pd.concat([data_historical, raw_df]).reset_index(drop=True)
-            save_pickle(final_df, PROCESSED_DATA_PATH, f'{location_type}_data')
+            # only the month partitions from the first new timestamp on are rewritten
+            store = processed_store(f'{location_type}_data')
+            store.append(raw_df)
             print(f'{location_type} data updated.')
             data_logs.info('%s data updated.', location_type)
-            return final_df
+            return store.last_timestamp()
         except Exception as e:
             print(f'Error during {location_type} processing: ', str(e))
             data_logs.error('Error during %s processing: ', location_type, str(e))
\ No newline at end of file
@@ -0,0 +1,276 @@
+'''
+This script stores processed market and weather data as an append-only, month-partitioned columnar store.
+It includes a class `PartitionedStore` which keeps one directory per month with one NumPy file per column,
+and a small json manifest tracking the partitions and the last stored timestamp.
+
+Author: Aman Bhatt
+'''
+
+import os
+import sys
+import json
+import shutil
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Parent directory
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+# Custom modules
+from config.paths import PROCESSED_DATA_PATH, STORE_DATA_PATH, LOGS_PATH
+from src.utils import *
+
+data_logs = configure_logger(LOGS_PATH, 'data.log')
+
+
+class PartitionedStore:
+    def __init__(self, path, name, on_column='datetime'):
+        """
+        Initializes the PartitionedStore for one dataset.
+
+        Args:
+            path (str): Directory holding all stores.
+            name (str): Name of the dataset (e.g. 'dam_data').
+            on_column (str): Datetime column used for partitioning and ordering.
+        """
+        self.name = name
+        self.on_column = on_column
+        self.store_path = os.path.join(path, name)
+        self.manifest_path = os.path.join(self.store_path, 'manifest.json')
+
+    def exists(self):
+        """
+        Checks whether the store has been written.
+        """
+        return os.path.exists(self.manifest_path)
+
+    def _read_manifest(self):
+        """
+        Reads the manifest, or returns an empty one for a new store.
+        """
+        if not self.exists():
+            return {'columns': [], 'rows': 0, 'last_timestamp': None, 'partitions': {}}
+        with open(self.manifest_path, 'r') as file:
+            return json.load(file)
+
+    def _write_manifest(self, manifest):
+        """
+        Atomically replaces the manifest.
+        """
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def last_timestamp(self):
+        """
+        Returns the last stored timestamp without reading any partition.
+
+        Returns:
+            pd.Timestamp: Last stored timestamp, or None for an empty store.
+        """
+        last_timestamp = self._read_manifest()['last_timestamp']
+        return pd.Timestamp(last_timestamp) if last_timestamp else None
+
+    def partitions(self):
+        """
+        Returns the manifest entries of the partitions without reading any of them.
+
+        Returns:
+            dict: Columns, row count and first and last timestamp of every partition, keyed by month in order.
+        """
+        return self._read_manifest()['partitions']
+
+    def metadata(self):
+        """
+        Returns the free-form metadata saved with the store.
+
+        Returns:
+            dict: Saved metadata (empty for a new store).
+        """
+        return self._read_manifest().get('metadata', {})
+
+    def set_metadata(self, **values):
+        """
+        Saves free-form metadata alongside the manifest.
+
+        Args:
+            **values: Json-serializable values to save.
+        """
+        os.makedirs(self.store_path, exist_ok=True)
+        manifest = self._read_manifest()
+        manifest['metadata'] = {**manifest.get('metadata', {}), **values}
+        self._write_manifest(manifest)
+
+    def clear(self):
+        """
+        Deletes every partition and the manifest.
+        """
+        shutil.rmtree(self.store_path, ignore_errors=True)
+
+    def _read_partition(self, month, info, mmap_mode=None, columns=None):
+        """
+        Reads one month partition.
+
+        Args:
+            month (str): Partition key ('YYYY-MM').
+            info (dict): Manifest entry of the partition; its column list names the files of partitions
+                         written before they carried their own columns.json.
+            mmap_mode (str): Memory-map mode passed to np.load (None reads into memory).
+            columns (list): Read only these columns (None reads all).
+
+        Returns:
+            pd.DataFrame: Partition data.
+        """
+        return load_columns(os.path.join(self.store_path, month), mmap_mode, columns=info['columns'], usecols=columns)
+
+    def _write_partition(self, month, df):
+        """
+        Writes one month partition, replacing the previous version of it.
+
+        Args:
+            month (str): Partition key ('YYYY-MM').
+            df (pd.DataFrame): Partition data.
+        """
+        save_columns(df, os.path.join(self.store_path, month))
+
+    def _write(self, df, truncate):
+        """
+        Writes new rows into the month partitions they fall in; untouched partitions are not read or rewritten.
+
+        Args:
+            df (pd.DataFrame): New rows.
+            truncate (bool): Drop every stored row at or after the first new timestamp (append),
+                             instead of replacing only rows with the same timestamp (upsert).
+        """
+        if df is None or df.empty:
+            return
+        os.makedirs(self.store_path, exist_ok=True)
+        manifest = self._read_manifest()
+        partitions = manifest['partitions']
+
+        df = df.sort_values(self.on_column)
+        months = df[self.on_column].dt.strftime('%Y-%m')
+        new_partitions = {month: group for month, group in df.groupby(months)}
+
+        first_timestamp = df[self.on_column].iloc[0]
+        touched = set(new_partitions)
+        if truncate:
+            touched |= {month for month, info in partitions.items() if pd.Timestamp(info['last']) >= first_timestamp}
+
+        for month in sorted(touched):
+            frames = []
+            if month in partitions:
+                existing = self._read_partition(month, partitions[month])
+                if truncate:
+                    existing = existing[existing[self.on_column] < first_timestamp]
+                frames.append(existing)
+            if month in new_partitions:
+                frames.append(new_partitions[month])
+            combined = pd.concat(frames)
+            combined = combined.drop_duplicates(subset=[self.on_column], keep='last').sort_values(self.on_column).reset_index(drop=True)
+
+            if combined.empty:
+                shutil.rmtree(os.path.join(self.store_path, month), ignore_errors=True)
+                partitions.pop(month, None)
+                continue
+            self._write_partition(month, combined)
+            partitions[month] = {'columns': list(combined.columns), 'rows': len(combined),
+                                 'first': str(combined[self.on_column].iloc[0]),
+                                 'last': str(combined[self.on_column].iloc[-1])}
+
+        last_month = max(partitions)
+        manifest['partitions'] = dict(sorted(partitions.items()))
+        manifest['columns'] = partitions[last_month]['columns']
+        manifest['rows'] = sum(info['rows'] for info in partitions.values())
+        manifest['last_timestamp'] = partitions[last_month]['last']
+        self._write_manifest(manifest)
+
+    def append(self, df):
+        """
+        Appends new rows; stored rows at or after the first new timestamp are replaced.
+
+        Args:
+            df (pd.DataFrame): New rows.
+        """
+        self._write(df, truncate=True)
+
+    def upsert(self, df):
+        """
+        Merges rows into the store; stored rows with the same timestamp are replaced.
+
+        Args:
+            df (pd.DataFrame): Rows to merge.
+        """
+        self._write(df, truncate=False)
+
+    def load(self, start_date=None, end_date=None, mmap_mode=None, columns=None):
+        """
+        Loads the stored rows in [start_date, end_date), reading only the partitions that overlap the range.
+
+        Args:
+            start_date (str or datetime): First timestamp to load (None for the beginning).
+            end_date (str or datetime): Timestamp to load up to, excluded (None for the end).
+            mmap_mode (str): Memory-map mode passed to np.load (None reads into memory).
+            columns (list): Read only these columns (None reads all); the datetime column is always read.
+
+        Returns:
+            pd.DataFrame: Stored data.
+        """
+        manifest = self._read_manifest()
+        start_date = pd.Timestamp(start_date) if start_date is not None else None
+        end_date = pd.Timestamp(end_date) if end_date is not None else None
+
+        if columns is not None:
+            columns = [self.on_column] + [column for column in columns if column != self.on_column]
+        frames = []
+        for month, info in manifest['partitions'].items():
+            if start_date is not None and pd.Timestamp(info['last']) < start_date:
+                continue
+            if end_date is not None and pd.Timestamp(info['first']) >= end_date:
+                continue
+            frames.append(self._read_partition(month, info, mmap_mode, columns))
+        if not frames:
+            return pd.DataFrame(columns=columns if columns is not None else manifest['columns'])
+
+        df = pd.concat(frames, ignore_index=True)
+        if start_date is not None:
+            df = df[df[self.on_column] >= start_date]
+        if end_date is not None:
+            df = df[df[self.on_column] < end_date]
+        return df.reset_index(drop=True)
+
+
+def processed_store(name):
+    """
+    Returns the partitioned store of a processed dataset, seeding it once from the legacy pickle if needed.
+
+    Args:
+        name (str): Name of the processed dataset (e.g. 'dam_data', 'weather_data').
+
+    Returns:
+        PartitionedStore: Store of the dataset.
+    """
+    store = PartitionedStore(STORE_DATA_PATH, name)
+    if not store.exists() and os.path.exists(os.path.join(PROCESSED_DATA_PATH, name)):
+        store.upsert(load_pickle(PROCESSED_DATA_PATH, name))
+        data_logs.info('%s migrated to the partitioned store.', name)
+    return store
+
+def load_processed(name, start_date=None, end_date=None):
+    """
+    Loads a processed dataset, optionally restricted to [start_date, end_date).
+
+    Args:
+        name (str): Name of the processed dataset (e.g. 'dam_data', 'weather_data').
+        start_date (str or datetime): First timestamp to load.
+        end_date (str or datetime): Timestamp to load up to, excluded.
+
+    Returns:
+        pd.DataFrame: Processed data.
+    """
+    return processed_store(name).load(start_date, end_date)
@@ -8,7 +8,6 @@ Author: Aman Bhatt
 # Import necessary libraries
 import pandas as pd
 import numpy as np
-import requests
 import json
 import os, sys
 from datetime import datetime
@@ -21,19 +20,16 @@ from src.utils import *
 from config.paths import *
 forecasting_logs = configure_logger(LOGS_PATH, 'forecasting.log')
 
-# Import IexDataFetcher class for accessing the IEX API
-from src.data_ingestion.iex_data import IexDataFetcher
+# Shared client for accessing the IEX API
+from src.get_apis.iex_client import get_iex_client
 
 class DAMInsertion:
     def __init__(self):
         '''
-        Initializes the DAMInsertion class with necessary credentials and IEX data fetcher.
+        Initializes the DAMInsertion class with the shared IEX API client.
         '''
-        # Access credentials
-        self.base_url = os.getenv('base_url')
-        self.user_email = os.getenv('email')
-        self.user_password = os.getenv('password')
-        self.iex_data = IexDataFetcher()
+        # shared api client (credentials, cached token and pooled connections)
+        self.client = get_iex_client()
 
     def forecast_dict(self, forecasts, forecasting_date, forecast_type):
         '''
@@ -109,9 +105,7 @@ class DAMInsertion:
         - forecast_type: Type of forecast data ('dam_forecast', 'lower_bound', 'upper_bound')
         '''
         forecast_data = self.forecast_dict(forecasts, forecasting_date, forecast_type)  
-        url = self.base_url + 'savePriceForecast'
-        headers = {'Authorization': 'Bearer ' + str(self.iex_data._get_token()), 'Content-Type': 'application/json'}
-        response = requests.post(url=url, data=json.dumps(forecast_data), headers=headers)
+        response = self.client.post('savePriceForecast', data=json.dumps(forecast_data))
         if response.json()['status'] == 'success':
             print(f'{forecast_type} forecast inserted successfully.')
             forecasting_logs.info('%s forecast inserted successfully.', forecast_type)
@@ -122,13 +116,10 @@ class DAMInsertion:
 class DirInsertion:
     def __init__(self):
         '''
-        Initializes the DirInsertion class with necessary credentials and IEX data fetcher.
+        Initializes the DirInsertion class with the shared IEX API client.
         '''
-        # Access credentials
-        self.base_url = os.getenv('base_url')
-        self.user_email = os.getenv('email')
-        self.user_password = os.getenv('password')
-        self.iex_data = IexDataFetcher()
+        # shared api client (credentials, cached token and pooled connections)
+        self.client = get_iex_client()
 
     def forecast_dict(self, forecasts, forecasting_date, forecast_type):
         '''
@@ -202,9 +193,7 @@ class DirInsertion:
         - forecast_type: Type of forecast data ('directional_forecast')
         '''
         forecast_data = self.forecast_dict(forecasts, forecasting_date, forecast_type)  
-        url = self.base_url + 'saveRTMPriceForecast'
-        headers = {'Authorization': 'Bearer ' + str(self.iex_data._get_token()), 'Content-Type': 'application/json'}
-        response = requests.post(url=url, data=json.dumps(forecast_data), headers=headers)
+        response = self.client.post('saveRTMPriceForecast', data=json.dumps(forecast_data))
         if response.json()['status'] == 'success':
             print(f'{forecast_type} forecast inserted successfully.')
             forecasting_logs.info('%s forecast inserted successfully.', forecast_type)
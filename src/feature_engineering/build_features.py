@@ -1,6 +1,7 @@
 '''
 This script creates multiple features for both day-ahead and real-time markets.
-It includes a class `FeatureEngineering` with methods to create multiple features.
+It includes a class `FeatureEngineering` with methods to create multiple features, and a `FeatureRegistry`
+of declared features used to compute only the features a model needs.
 
 Author: Aman Bhatt
 '''
@@ -8,23 +9,161 @@ Author: Aman Bhatt
 # Import necessary libraries
 import pandas as pd
 import numpy as np
+import os
+import json
 import math
+import shutil
+import hashlib
+import inspect
 from functools import reduce
+from joblib import Parallel, delayed
 from sklearn.preprocessing import LabelEncoder
 from config.paths import *
 from src.utils import *
 
 training_logs = configure_logger(LOGS_PATH, 'training.log')
 
+# dtypes of calendar and flag features in compact mode; every other numeric feature becomes float32
+COMPACT_DTYPES = {
+    'capping': 'int16', 'hour': 'int8', 'dom': 'int8', 'month': 'int8', 'year': 'int16', 'dow': 'int8',
+    'doy': 'int16', 'tb': 'int8', 'next_day_sunday': 'int8', 'hour_dow': 'int16', 'isMorning': 'int8',
+    'isDay': 'int8', 'isEvening': 'int8', 'isNight': 'int8', 'winter': 'int8', 'summer': 'int8',
+    'monsoon': 'int8', 'autumn': 'int8',
+}
+
+class FeatureSpec:
+    def __init__(self, name, inputs, func):
+        '''
+        Declares one feature column.
+
+        Args:
+        - name: Name of the feature column
+        - inputs: Columns the feature is computed from (raw columns or other features)
+        - func: Function computing the feature from a DataFrame holding its inputs
+        '''
+        self.name = name
+        self.inputs = list(inputs)
+        self.func = func
+
+class FeatureRegistry:
+    def __init__(self):
+        '''
+        Initializes an empty registry of feature specs.
+        '''
+        self.specs = {}
+
+    def register(self, name, inputs, func):
+        '''
+        Adds a feature spec to the registry.
+        '''
+        self.specs[name] = FeatureSpec(name, inputs, func)
+
+    def resolve(self, names, available=()):
+        '''
+        Resolves the dependency closure of the requested features.
+
+        Args:
+        - names: Requested feature names
+        - available: Columns that are already present and need no computation
+
+        Returns:
+        - List of feature names to compute, each after its inputs
+        '''
+        available, order, visiting = set(available), [], set()
+
+        def visit(name):
+            if name in available or name in order:
+                return
+            if name not in self.specs:
+                raise KeyError(f'Unknown feature: {name}')
+            if name in visiting:
+                raise ValueError(f'Circular feature dependency: {name}')
+            visiting.add(name)
+            for input_name in self.specs[name].inputs:
+                visit(input_name)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    def compute(self, data, names):
+        '''
+        Computes the requested features and only what they depend on.
+
+        Args:
+        - data: DataFrame holding the raw columns
+        - names: Requested feature names
+
+        Returns:
+        - DataFrame with the raw columns and the computed features
+        '''
+        data = data.copy()
+        for name in self.resolve(names, data.columns):
+            data[name] = self.specs[name].func(data)
+        return data
+
 class FeatureEngineering:
-    def __init__(self, PROJECT_PATH):
+    def __init__(self, PROJECT_PATH, compact=False):
         '''
         Initializes the FeatureEngineering class with the project path.
 
         Args:
         - PROJECT_PATH: Path to the project directory
+        - compact: Create float32 continuous and int8/int16 calendar features instead of 64-bit ones
         '''
         self.PROJECT_PATH = PROJECT_PATH
+        self.compact = compact
+        self.float_dtype = 'float32' if compact else 'float64'
+        self._weather_block_cache = {}
+
+    def __getstate__(self):
+        # process-pool tasks pickle the instance; they get their rows of the weather block with the task instead
+        return {**self.__dict__, '_weather_block_cache': {}}
+
+    def _cast(self, name, values):
+        '''
+        Casts a newly created feature to its compact dtype; a no-op unless compact mode is on.
+
+        Args:
+        - name: Name of the feature
+        - values: Feature values (Series or array)
+
+        Returns:
+        - Feature values in the dtype of the current mode
+        '''
+        if not self.compact or not pd.api.types.is_numeric_dtype(values.dtype):
+            return values
+        return values.astype(COMPACT_DTYPES.get(name, 'float32'))
+
+    def _compact_inputs(self, data):
+        '''
+        Casts the 64-bit float input columns to float32 in compact mode, before any feature is derived from them.
+        '''
+        if self.compact:
+            # astype casts column by column; copy consolidates the result into one block per dtype
+            data = data.astype({column: 'float32' for column in data.select_dtypes('float64').columns}).copy()
+        return data
+
+    def memory_report(self, data):
+        '''
+        Reports the memory used by a feature matrix and what the same matrix takes with 64-bit columns.
+
+        Args:
+        - data: Feature matrix
+
+        Returns:
+        - Dictionary with the memory in MB of the matrix, of its 64-bit equivalent, and the saving in percent
+        '''
+        used = data.memory_usage(index=False, deep=True)
+        numeric = [pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes]
+        wide = [len(data) * 8 if is_numeric else size for is_numeric, size in zip(numeric, used)]
+        report = {'memory_mb': round(used.sum() / 1024**2, 1), 'memory_64bit_mb': round(sum(wide) / 1024**2, 1)}
+        report['saving_pct'] = round(100 * (1 - used.sum() / max(sum(wide), 1)), 1)
+        print(f"Feature matrix: {report['memory_mb']} MB ({report['memory_64bit_mb']} MB at 64-bit, {report['saving_pct']}% saved).")
+        training_logs.info('Feature matrix: %s MB (%s MB at 64-bit, %s%% saved).', report['memory_mb'], report['memory_64bit_mb'], report['saving_pct'])
+        return report
 
     def process_holidays(self, df):
         try:    
@@ -57,21 +196,115 @@ class FeatureEngineering:
 
         return shifted_df
 
-    def merge_dataframes(self, dfs, on_column='datetime'):
+    def merge_dataframes(self, dfs, on_column='datetime', how='grid', tolerance=None):
         """
-        This method merges all the dataframes in a list dfs.
+        This method merges all the dataframes in a list dfs onto the rows of the first one (a left join) and
+        drops the incomplete rows. Inputs are aligned by searchsorted position on the sorted key, and the complete
+        rows are written into one preallocated block in a single pass.
 
         Args:
         - dfs: List of DataFrames to be merged
         - on_column: Column used for merging
+        - how: 'grid' to match identical keys only, or 'asof' to take the last row at or before each key
+        - tolerance: Largest key distance accepted by 'asof' alignment (None for no limit)
 
         Returns:
         - Merged DataFrame
         """
-        merged_df = reduce(lambda left, right: pd.merge(left, right, on=on_column, how='left'), dfs)
-        merged_df.dropna(inplace=True)
+        if how not in ['grid', 'asof']:
+            raise ValueError(f'Unknown alignment: {how}')
+
+        names = [column for df in dfs[1:] for column in df.columns if column != on_column]
+        keys = [df[on_column] for df in dfs]
+        if (len(set(names)) < len(names) or set(names) & set(dfs[0].columns)
+                or any(key.dtype != keys[0].dtype or key.duplicated().any() for key in keys[1:])):
+            # suffixed or many-to-many joins keep the generic merge
+            merged_df = self._merge_fallback(dfs, on_column, how, tolerance)
+            rows = len(merged_df)
+            merged_df.dropna(inplace=True)
+            dropped = {}
+        else:
+            merged_df, rows, dropped = self._align(dfs, on_column, how, tolerance)
+
+        self.last_merge_report = {'rows': rows, 'dropped': rows - len(merged_df), 'dropped_by_input': dropped}
+        if rows > len(merged_df):
+            training_logs.info('Merge dropped %s of %s rows; rows dropped per input: %s', rows - len(merged_df), rows, dropped)
         return merged_df
 
+    def _merge_fallback(self, dfs, on_column, how, tolerance):
+        """
+        This method merges the dataframes pairwise with pandas.
+        """
+        if how == 'grid':
+            return reduce(lambda left, right: pd.merge(left, right, on=on_column, how='left'), dfs)
+        return reduce(lambda left, right: pd.merge_asof(left.sort_values(on_column), right.sort_values(on_column),
+                                                        on=on_column, tolerance=tolerance), dfs)
+
+    def _align(self, dfs, on_column, how, tolerance):
+        """
+        This method places the columns of every dataframe at the rows of the first one, keeping only complete rows.
+        The result is the same as a chain of left merges followed by dropna.
+
+        Args:
+        - dfs: DataFrames to align; the first one gives the rows, the others must have unique keys
+        - on_column: Column used for merging
+        - how: 'grid' or 'asof' alignment
+        - tolerance: Largest key distance accepted by 'asof' alignment
+
+        Returns:
+        - Aligned DataFrame, the number of rows before dropping, and the number of rows each input caused to drop
+        """
+        left_keys = dfs[0][on_column].to_numpy()
+        n = len(left_keys)
+
+        # first pass: the source row of every input for every left row, and whether it exists and is complete
+        sources, keep, dropped = [], np.ones(n, dtype=bool), {}
+        for i, df in enumerate(dfs):
+            if i == 0:
+                positions, found = np.arange(n), np.ones(n, dtype=bool)
+            else:
+                if not df[on_column].is_monotonic_increasing:
+                    df = df.sort_values(on_column)
+                right_keys = df[on_column].to_numpy()
+                if how == 'grid':
+                    positions = np.minimum(np.searchsorted(right_keys, left_keys), max(len(right_keys) - 1, 0))
+                    found = (right_keys[positions] == left_keys) if len(right_keys) else np.zeros(n, dtype=bool)
+                else:
+                    positions = np.maximum(np.searchsorted(right_keys, left_keys, side='right') - 1, 0)
+                    found = (left_keys >= right_keys[positions]) if len(right_keys) else np.zeros(n, dtype=bool)
+                    if tolerance is not None:
+                        found &= left_keys - right_keys[positions] <= np.timedelta64(pd.Timedelta(tolerance))
+            value_columns = [column for column in df.columns if column != on_column or i == 0]
+            complete = found & df[value_columns].notna().all(axis=1).to_numpy()[positions]
+            sources.append((df, positions, found.all(), value_columns))
+            dropped[f'{i}:{next((c for c in value_columns if c != on_column), on_column)}'] = int(n - complete.sum())
+            keep &= complete
+
+        # second pass: one column-major block holding every float64 column of the kept rows
+        rows = np.flatnonzero(keep)
+        float_columns = [column for df, _, _, value_columns in sources for column in value_columns if df[column].dtype == 'float64']
+        block = np.empty((len(rows), len(float_columns)), order='F')
+        block_index = {column: j for j, column in enumerate(float_columns)}
+        index = pd.RangeIndex(n) if keep.all() else rows
+        merged_df = pd.DataFrame(block, columns=float_columns, index=index, copy=False)
+
+        position = 0
+        for i, (df, positions, found_all, value_columns) in enumerate(sources):
+            taken = positions[rows]
+            for column in value_columns:
+                values = df[column].to_numpy()[taken]
+                if df[column].dtype == 'float64':
+                    block[:, block_index[column]] = values
+                else:
+                    # a left merge with missing rows widens ints to float64 and bools to object
+                    if not found_all and values.dtype.kind in 'iu':
+                        values = values.astype('float64')
+                    elif not found_all and values.dtype.kind == 'b':
+                        values = values.astype(object)
+                    merged_df.insert(position, column, values)
+                position += 1
+        return merged_df, n, dropped
+
     def _capping(self, data):
         """
         This method applies capping to the data based on specific conditions.
@@ -88,7 +321,7 @@ class FeatureEngineering:
             (data['datetime'] > '2023-04-03 23:45:00')
         ]
         capping_values = [20000, 12000, 10000]
-        data['capping'] = np.select(conditions, capping_values)
+        data['capping'] = self._cast('capping', np.select(conditions, capping_values))
         return data
 
     def _datetime_features(self, df):
@@ -102,25 +335,25 @@ class FeatureEngineering:
         - DataFrame with additional datetime features
         """
         df['date'] = pd.to_datetime(df['datetime'].dt.date)
-        df['hour'] = df['datetime'].dt.hour + 1
-        df['dom'] = df['datetime'].dt.day
-        df['month'] = df['datetime'].dt.month
-        df['year'] = df['datetime'].dt.year
-        df['dow'] = df['datetime'].dt.dayofweek
-        df['doy'] = df['datetime'].dt.dayofyear
-        df['tb'] = ((df['datetime'].dt.hour * 60 + df['datetime'].dt.minute) // 15 + 1)
-        df['next_day_sunday'] = np.where(df['dow'] == 5, 1, 0)
-        df['hour_dow'] = df['hour'] * df['dow']
-
-        df['isMorning'] = ((df['datetime'].dt.hour >= 6) & (df['datetime'].dt.hour <= 9)).astype(int)
-        df['isDay'] = ((df['datetime'].dt.hour >= 10) & (df['datetime'].dt.hour <= 16)).astype(int)
-        df['isEvening'] = ((df['datetime'].dt.hour >= 17) & (df['datetime'].dt.hour <= 23)).astype(int)
-        df['isNight'] = ((df['datetime'].dt.hour == 24) | ((df['datetime'].dt.hour >= 1) & (df['datetime'].dt.hour <= 5))).astype(int)
-
-        df['winter'] = ((df['month'] == 12) | (df['month'] == 1) | (df['month'] == 2)).astype(int)
-        df['summer'] = ((df['month'] >= 3) & (df['month'] <= 6)).astype(int)
-        df['monsoon'] = ((df['month'] >= 7) & (df['month'] <= 8)).astype(int)
-        df['autumn'] = ((df['month'] >= 9) & (df['month'] == 11)).astype(int)
+        df['hour'] = self._cast('hour', df['datetime'].dt.hour + 1)
+        df['dom'] = self._cast('dom', df['datetime'].dt.day)
+        df['month'] = self._cast('month', df['datetime'].dt.month)
+        df['year'] = self._cast('year', df['datetime'].dt.year)
+        df['dow'] = self._cast('dow', df['datetime'].dt.dayofweek)
+        df['doy'] = self._cast('doy', df['datetime'].dt.dayofyear)
+        df['tb'] = self._cast('tb', ((df['datetime'].dt.hour * 60 + df['datetime'].dt.minute) // 15 + 1))
+        df['next_day_sunday'] = self._cast('next_day_sunday', np.where(df['dow'] == 5, 1, 0))
+        df['hour_dow'] = self._cast('hour_dow', df['hour'].astype('int32') * df['dow'])
+
+        df['isMorning'] = self._cast('isMorning', ((df['datetime'].dt.hour >= 6) & (df['datetime'].dt.hour <= 9)).astype(int))
+        df['isDay'] = self._cast('isDay', ((df['datetime'].dt.hour >= 10) & (df['datetime'].dt.hour <= 16)).astype(int))
+        df['isEvening'] = self._cast('isEvening', ((df['datetime'].dt.hour >= 17) & (df['datetime'].dt.hour <= 23)).astype(int))
+        df['isNight'] = self._cast('isNight', ((df['datetime'].dt.hour == 24) | ((df['datetime'].dt.hour >= 1) & (df['datetime'].dt.hour <= 5))).astype(int))
+
+        df['winter'] = self._cast('winter', ((df['month'] == 12) | (df['month'] == 1) | (df['month'] == 2)).astype(int))
+        df['summer'] = self._cast('summer', ((df['month'] >= 3) & (df['month'] <= 6)).astype(int))
+        df['monsoon'] = self._cast('monsoon', ((df['month'] >= 7) & (df['month'] <= 8)).astype(int))
+        df['autumn'] = self._cast('autumn', ((df['month'] >= 9) & (df['month'] == 11)).astype(int))
 
         return df
 
@@ -140,7 +373,8 @@ class FeatureEngineering:
         Returns:
         - DataFrame with the target column added
         """
-        data['target'] = data[f'mcp_{market_type}'].shift(-96) if market_type == 'dam' else data[f'mcp_{market_type}'].shift(-96 * 2)
+        target = data[f'mcp_{market_type}'].shift(-96) if market_type == 'dam' else data[f'mcp_{market_type}'].shift(-96 * 2)
+        data['target'] = self._cast('target', target)
         return data
 
     def _lags(self, df):
@@ -153,15 +387,19 @@ class FeatureEngineering:
         Returns:
         - DataFrame with lag features added
         """
-        for column in df.columns[1:11]:
-            shift_columns = [df[column].shift(96 * i) for i in range(1, 6)]
-            df = pd.concat([df] + shift_columns, axis=1)
-            df.columns = [*df.columns[:-5], *[f'change_in_{column}_wrt_day_{i}' for i in range(1, 6)]]
+        columns = df.columns[1:11]
+        shifts = [96 * i for i in range(1, 6)] + [i * 4 for i in [1, 2, 4, 8, 12, 18]]
+        names = [name for column in columns for name in
+                 [f'change_in_{column}_wrt_day_{i}' for i in range(1, 6)] + [f'{column}_lag_{i}h' for i in [1, 2, 4, 8, 12, 18]]]
 
-            for i in [1, 2, 4, 8, 12, 18]:
-                df[f'{column}_lag_{i}h'] = df[column].shift(i * 4)
+        # shift every source column by every lag at once on one (rows, columns, shifts) array
+        values = df[columns].to_numpy(dtype=self.float_dtype)
+        lags = np.full((len(df), len(columns), len(shifts)), np.nan, dtype=self.float_dtype)
+        for k, shift in enumerate(shifts):
+            lags[shift:, :, k] = values[:len(df) - shift]
 
-        return df
+        lags = pd.DataFrame(lags.reshape(len(df), -1), index=df.index, columns=names)
+        return pd.concat([df, lags], axis=1)
 
     def _min_max(self, df):
         """
@@ -173,20 +411,18 @@ class FeatureEngineering:
         Returns:
         - DataFrame with min-max features added
         """
-        for column in df.columns[1:11]:
-            hour_mean = df.groupby(['date', 'hour']).mean()[column].reset_index().rename(columns={column: f'hour_mean_{column}'})
-            df = pd.merge(df, hour_mean, on=['date', 'hour'], how='left')
-
-            daily_mean = df.groupby(['date']).mean()[column].reset_index().rename(columns={column: f'daily_mean_{column}'})
-            df = pd.merge(df, daily_mean, on=['date'], how='left')
-
-            daily_min = df.groupby(['date']).min()[column].reset_index().rename(columns={column: f'daily_min_{column}'})
-            df = pd.merge(df, daily_min, on=['date'], how='left')
+        columns = list(df.columns[1:11])
+        hourly = df.groupby(['date', 'hour'], sort=False)[columns]
+        daily = df.groupby(['date'], sort=False)[columns]
 
-            daily_max = df.groupby(['date']).max()[column].reset_index().rename(columns={column: f'daily_max_{column}'})
-            df = pd.merge(df, daily_max, on=['date'], how='left')
+        # aggregate all columns once per group, then broadcast back to the rows by group number
+        hour_codes, day_codes = hourly.ngroup().to_numpy(), daily.ngroup().to_numpy()
+        stats = [hourly.mean().to_numpy()[hour_codes], daily.mean().to_numpy()[day_codes],
+                 daily.min().to_numpy()[day_codes], daily.max().to_numpy()[day_codes]]
+        names = [f'{stat}_{column}' for column in columns for stat in ['hour_mean', 'daily_mean', 'daily_min', 'daily_max']]
 
-        return df
+        min_max = pd.DataFrame(np.stack(stats, axis=2).reshape(len(df), -1).astype(self.float_dtype, copy=False), columns=names)
+        return pd.concat([df.reset_index(drop=True), min_max], axis=1)
 
     def _ema(self, df, market_type):
         """
@@ -200,10 +436,10 @@ class FeatureEngineering:
         - DataFrame with EMA features added
         """
         for i in [1, 3, 6, 12]:
-            df[f'ewma_{i}h'] = df[f'mcp_{market_type}'].ewm(span=4 * i).mean()
+            df[f'ewma_{i}h'] = self._cast(f'ewma_{i}h', df[f'mcp_{market_type}'].ewm(span=4 * i).mean())
 
         for i in [1, 3, 5]:
-            df[f'ewma_{i}d'] = df[f'mcp_{market_type}'].ewm(span=96 * i).mean()
+            df[f'ewma_{i}d'] = self._cast(f'ewma_{i}d', df[f'mcp_{market_type}'].ewm(span=96 * i).mean())
         return df
 
     def _mean(self, df, market_type):
@@ -219,7 +455,8 @@ class FeatureEngineering:
         """
         window_sizes = [2, 3, 5]
         for window_size in window_sizes:
-            df[f'mcp_{market_type}_mean_{window_size}d'] = df[f'mcp_{market_type}'].rolling(window_size * 96).mean()
+            name = f'mcp_{market_type}_mean_{window_size}d'
+            df[name] = self._cast(name, df[f'mcp_{market_type}'].rolling(window_size * 96).mean())
         return df
 
     def _interaction(self, df, market_type):
@@ -233,11 +470,9 @@ class FeatureEngineering:
         Returns:
         - DataFrame with interaction features added
         """
-        df[f'mcp_{market_type}_with_dom'] = df[f'mcp_{market_type}'] * df['dom']
-        df[f'mcp_{market_type}_with_month'] = df[f'mcp_{market_type}'] * df['month']
-        df[f'mcp_{market_type}_with_dow'] = df[f'mcp_{market_type}'] * df['dow']
-        df[f'mcp_{market_type}_with_doy'] = df[f'mcp_{market_type}'] * df['doy']
-        df[f'mcp_{market_type}_with_tb'] = df[f'mcp_{market_type}'] * df['tb']
+        for feature in ['dom', 'month', 'dow', 'doy', 'tb']:
+            name = f'mcp_{market_type}_with_{feature}'
+            df[name] = self._cast(name, df[f'mcp_{market_type}'] * df[feature])
         return df
 
     def _covid(self, df):
@@ -257,20 +492,22 @@ class FeatureEngineering:
         df['covid_second_wave'] = df['covid_second_wave'].replace(np.nan, 0)
         return df
 
-    def _cyclic(self, df, feature):
+    def _cyclic(self, df, feature, period=None):
         """
         This method adds cyclic features (cosine and sine) for the specified column in the DataFrame.
 
         Args:
         - df: DataFrame containing data
         - feature: Column for which cyclic features are to be added
+        - period: Value mapped to a full cycle (defaults to the column maximum)
 
         Returns:
         - DataFrame with cyclic features added
         """
-        df['norm'] = 2 * math.pi * df[f"{feature}"] / df[f"{feature}"].max()
-        df[f"cos_{feature}"] = np.cos(df["norm"])
-        df[f"sin_{feature}"] = np.sin(df["norm"])
+        period = period or df[f"{feature}"].max()
+        df['norm'] = 2 * math.pi * df[f"{feature}"] / period
+        df[f"cos_{feature}"] = self._cast(f"cos_{feature}", np.cos(df["norm"]))
+        df[f"sin_{feature}"] = self._cast(f"sin_{feature}", np.sin(df["norm"]))
         df.drop('norm', axis=1, inplace=True)
         return df
 
@@ -295,33 +532,227 @@ class FeatureEngineering:
         data = self._ema(data, market_type)
         data = self._mean(data, market_type)
         data = self._interaction(data, market_type)
-        data = self._cyclic(data, 'tb')
-        data = self._cyclic(data, 'hour')
-        data = self._cyclic(data, 'dow')
-        data = self._cyclic(data, 'doy')
+        # fixed periods (the maxima of a full history) so that short inference windows get the same values
+        data = self._cyclic(data, 'tb', 96)
+        data = self._cyclic(data, 'hour', 24)
+        data = self._cyclic(data, 'dow', 6)
+        data = self._cyclic(data, 'doy', 366)
         return data
 
-    def _weather_features(self, data, weather):
+    def _weather_block(self, frame, columns, prec_columns):
+        """
+        This method computes the daily means, day-over-day changes and prec_tb of the weather columns of a frame.
+
+        Args:
+        - frame: DataFrame with datetime, the weather columns and the precipitation columns
+        - columns: Weather columns
+        - prec_columns: Precipitation columns summed into prec_tb
+
+        Returns:
+        - DataFrame of weather features, row-aligned with the frame
+        """
+        values = frame[columns].to_numpy(dtype=self.float_dtype)
+
+        # daily means and day-over-day changes of the whole weather block as array operations
+        days = frame['datetime'].dt.normalize().to_numpy()
+        day_codes = pd.factorize(days)[0]
+        blocks = [frame[columns].groupby(days, sort=False).mean().to_numpy()[day_codes]]
+        for i in range(1, 4):
+            shifted = np.full_like(values, np.nan)
+            shifted[96 * i:] = values[:len(frame) - 96 * i]
+            blocks.append(values - shifted)
+        names = [name for column in columns for name in [f'daily_mean_{column}'] + [f'change_in_{column}_wrt_day_{i}' for i in range(1, 4)]]
+        features = pd.DataFrame(np.stack(blocks, axis=2).reshape(len(frame), -1).astype(self.float_dtype, copy=False), columns=names)
+
+        # prec_tb used to be re-summed after every column, each time including its previous value,
+        # which leaves it at the number of weather columns times the sum of the precipitation columns
+        prec_tb = frame[prec_columns].sum(axis=1).to_numpy() * len(columns)
+        features.insert(4, 'prec_tb', self._cast('prec_tb', prec_tb))
+        return features
+
+    def weather_block(self, weather, hydro):
+        """
+        This method computes the market-independent weather features once per data version. The result is kept in
+        memory and on disk, so that the day-ahead and real-time pipelines share it; each market applies its own
+        offset with `shift_date` and passes it to `_get_features` as `weather_block`. A new data version reuses
+        the stored block up to the first day whose values changed and computes only the rows from there.
+
+        Args:
+        - weather: Unshifted DataFrame containing weather data
+        - hydro: Unshifted DataFrame containing hydro data, whose precipitation enters prec_tb
+
+        Returns:
+        - DataFrame with datetime and the weather features
+        """
+        try:
+            columns = list(weather.columns[1:65])
+            hydro = hydro[['datetime'] + [column for column in hydro.columns if column.startswith('prec_')]]
+            frame = self._compact_inputs(self.merge_dataframes([weather, hydro]).reset_index(drop=True))
+            prec_columns = [column for column in frame.columns if column.startswith('prec_')]
+
+            # the feature definitions (code, dtype mode and layout) and the data version (a checksum of every day)
+            definition = hashlib.sha1(inspect.getsource(FeatureEngineering).encode())
+            definition.update(json.dumps([list(frame.columns), self.compact]).encode())
+            definition = definition.hexdigest()[:12]
+            days = day_checksums(frame)
+            key = hashlib.sha1(json.dumps([definition, days]).encode()).hexdigest()[:12]
+
+            if key in self._weather_block_cache:
+                return self._weather_block_cache[key]
+            cache_path = os.path.join(FEATURES_PATH, 'weather_block')
+            block = None
+            if os.path.exists(os.path.join(cache_path, key)):
+                try:
+                    block = load_columns(os.path.join(cache_path, key), mmap_mode='c')
+                except FileNotFoundError:
+                    # removed by a run that moved on to newer data after the check; compute it again
+                    block = None
+            if block is None:
+                block = self._extend_weather_block(cache_path, definition, days, frame, columns, prec_columns)
+                # each data version has its own directory, swapped in atomically, and a json of its day checksums;
+                # older versions are removed only once this one is in place, each under its exclusive lock, so that
+                # no reader sees a half-removed block
+                save_columns(block, os.path.join(cache_path, key))
+                tmp_path = os.path.join(cache_path, f'{key}.json.{os.getpid()}.tmp')
+                with open(tmp_path, 'w') as file:
+                    json.dump({'definition': definition, 'days': days}, file)
+                os.replace(tmp_path, os.path.join(cache_path, f'{key}.json'))
+                for stale in os.listdir(cache_path):
+                    stale_path = os.path.join(cache_path, stale)
+                    if stale != key and os.path.isdir(stale_path) and '.' not in stale:
+                        with directory_lock(stale_path, exclusive=True):
+                            shutil.rmtree(stale_path, ignore_errors=True)
+                            for suffix in ['.json', '.lock']:
+                                if os.path.exists(stale_path + suffix):
+                                    os.remove(stale_path + suffix)
+                        training_logs.info('Stale weather feature block %s removed.', stale)
+            self._weather_block_cache = {key: block}
+            return block
+        except Exception as e:
+            print('Error while creating weather feature block: ', str(e))
+            training_logs.error('Error while creating weather feature block: %s', str(e))
+
+    def _extend_weather_block(self, cache_path, definition, days, frame, columns, prec_columns):
+        """
+        This method computes the weather block of a new data version from the stored one: rows of the days before
+        the first changed day are kept, and the rest are computed from a 3-day look-back, which gives the same
+        values as the whole frame since the features only see their own day and the three days before.
+
+        Args:
+        - cache_path: Directory of the stored weather blocks
+        - definition: Checksum of the feature definitions the stored block must match
+        - days: Checksum of every day of the frame
+        - frame: Merged weather and precipitation data
+        - columns: Weather columns
+        - prec_columns: Precipitation columns summed into prec_tb
+
+        Returns:
+        - DataFrame with datetime and the weather features
+        """
+        stored, first = None, 0
+        for name in os.listdir(cache_path) if os.path.exists(cache_path) else []:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(cache_path, name), 'r') as file:
+                    version = json.load(file)
+                if version['definition'] != definition:
+                    continue
+                # days are kept up to the first one that changed, or that is new or no longer in the data
+                same_days = 0
+                for (day, checksum), (stored_day, stored_checksum) in zip(days.items(), version['days'].items()):
+                    if day != stored_day or checksum != stored_checksum:
+                        break
+                    same_days += 1
+                if same_days == 0:
+                    continue
+                kept = int((frame['datetime'] < pd.Timestamp(list(days)[same_days - 1]) + pd.Timedelta(days=1)).sum())
+                if kept > first:
+                    stored = load_columns(os.path.join(cache_path, name[:-len('.json')]), mmap_mode='r')
+                    first = kept
+            except (FileNotFoundError, json.JSONDecodeError):
+                # removed or being replaced by another run; another version or the whole frame is used
+                continue
+
+        lookback = max(0, first - 96 * 3)
+        features = self._weather_block(frame.iloc[lookback:].reset_index(drop=True), columns, prec_columns)
+        if first:
+            features = pd.concat([stored.drop(columns='datetime').iloc[:first], features.iloc[first - lookback:]],
+                                 ignore_index=True)
+            training_logs.info('Weather feature block extended: %s rows kept, %s computed.', first, len(frame) - first)
+        else:
+            training_logs.info('Weather feature block computed: %s rows.', len(frame))
+        return pd.concat([frame[['datetime']], features], axis=1)
+
+    def _weather_features(self, data, weather, weather_block=None):
         """
         This method adds weather-related features to the DataFrame.
 
         Args:
         - data: DataFrame containing data
         - weather: DataFrame containing weather data
+        - weather_block: Precomputed weather features from `weather_block`, already shifted like the weather data
 
         Returns:
         - DataFrame with weather-related features added
         """
-        for column in weather.columns[1:65]:
-            daily_mean = data.groupby(['date']).mean()[column].reset_index().rename(columns={column: f'daily_mean_{column}'})
-            data = pd.merge(data, daily_mean, on=['date'], how='left')
+        columns = list(weather.columns[1:65])
+        prec_columns = list(data.filter(regex='^prec_').columns)
+        data = data.reset_index(drop=True)
+        if weather_block is None:
+            features = self._weather_block(data, columns, prec_columns)
+        else:
+            # translate the shared block onto the rows of this market by datetime
+            block_keys = weather_block['datetime'].to_numpy()
+            keys = data['datetime'].to_numpy()
+            positions = np.minimum(np.searchsorted(block_keys, keys), len(block_keys) - 1)
+            features = weather_block.drop(columns='datetime').iloc[positions].reset_index(drop=True)
+
+            # rows whose daily mean or day changes see other rows here than in the block (partial days, gaps in
+            # either series, the start of a window) are computed from the data itself, as without a block
+            direct = ~self._block_rows_match(keys, block_keys, positions)
+            if direct.any():
+                day_codes = pd.factorize(data['datetime'].dt.normalize().to_numpy())[0]
+                day_bounds = np.flatnonzero(np.r_[True, day_codes[1:] != day_codes[:-1], True])
+                direct_days = np.unique(day_codes[direct])
+                # consecutive days are computed together, each run from the 3-day look-back of its first day
+                runs = np.split(direct_days, np.flatnonzero(np.diff(direct_days) > 1) + 1)
+                for run in runs:
+                    start, end = day_bounds[run[0]], day_bounds[run[-1] + 1]
+                    lookback = max(0, start - 96 * 3)
+                    part = self._weather_block(data.iloc[lookback:end], columns, prec_columns)
+                    rows = np.flatnonzero(direct[start:end]) + start
+                    features.iloc[rows] = part.iloc[rows - lookback].to_numpy()
+        return pd.concat([data, features], axis=1)
+
+    def _block_rows_match(self, keys, block_keys, positions):
+        """
+        This method finds the rows of a market whose weather features are the same in the shared block as when
+        computed from the market rows: the row is in the block, its day has the same rows in both, and the rows
+        one to three days back by position are the same slots (or missing in both).
 
-            for i in range(1, 4):
-                data[f'change_in_{column}_wrt_day_{i}'] = (data[column] - data[column].shift(96 * i))
+        Args:
+        - keys: Datetimes of the market rows
+        - block_keys: Datetimes of the block rows
+        - positions: Position of every market row in the block
 
-            prec_columns = data.filter(regex='^prec_')
-            data['prec_tb'] = prec_columns.sum(axis=1)
-        return data
+        Returns:
+        - Boolean array, True where the block values can be used
+        """
+        match = block_keys[positions] == keys
+        one_day = np.timedelta64(1, 'D')
+        days, block_days = keys.astype('datetime64[D]'), block_keys.astype('datetime64[D]')
+        _, day_codes, day_counts = np.unique(days, return_inverse=True, return_counts=True)
+        day_rows = day_counts[day_codes]
+        block_day_rows = np.searchsorted(block_days, days + one_day) - np.searchsorted(block_days, days)
+        match &= day_rows == block_day_rows
+
+        rows = np.arange(len(keys))
+        for i in range(1, 4):
+            back, block_back = rows - 96 * i, positions - 96 * i
+            same_slot = keys[np.maximum(back, 0)] == block_keys[np.maximum(block_back, 0)]
+            match &= np.where(back >= 0, (block_back >= 0) & same_slot, block_back < 0)
+        return match
 
     def _interaction_features(self, data, weather, market_type):
         """
@@ -336,10 +767,239 @@ class FeatureEngineering:
         - DataFrame with interaction features added
         """
         for i in weather.columns[1:65]:
-            data[f'mcp_{market_type}_with_{i}'] = data[f'mcp_{market_type}'] * data[i]
+            data[f'mcp_{market_type}_with_{i}'] = self._cast(f'mcp_{market_type}_with_{i}', data[f'mcp_{market_type}'] * data[i])
         return data
 
-    def _get_features(self, data, weather, market_type, task='train'):
+    def _lookback_rows(self, tolerance=1e-6):
+        """
+        This method works out how many rows of history an inference row depends on.
+
+        Args:
+        - tolerance: Largest acceptable EWMA truncation error, relative to the price range
+
+        Returns:
+        - Number of rows needed before the first inference row
+        """
+        # the 5-day EWMA never forgets; stop once the weight of older rows drops below the tolerance
+        alpha = 2 / (96 * 5 + 1)
+        ewma_warmup = math.ceil(math.log(tolerance) / math.log(1 - alpha))
+        return max(self._halo_rows(), ewma_warmup)
+
+    def _halo_rows(self):
+        """
+        This method returns the longest finite look-back of any feature: the 5-day lags, changes and rolling mean.
+        """
+        return 96 * 5
+
+    def _slice_inference_inputs(self, dfs, days=1, tolerance=1e-6, margin_days=7):
+        """
+        This method cuts the raw inputs down to the period inference depends on, before they are merged.
+
+        Args:
+        - dfs: List of DataFrames to be merged, the first one driving the merge
+        - days: Number of days to forecast from
+        - tolerance: Largest acceptable EWMA truncation error, relative to the price range
+        - margin_days: Extra days kept so that rows dropped by the merge do not shorten the look-back
+
+        Returns:
+        - List of sliced DataFrames
+        """
+        rows = days * 96 + self._lookback_rows(tolerance)
+        start = dfs[0]['datetime'].max() - pd.Timedelta(minutes=15 * rows) - pd.Timedelta(days=margin_days)
+        return [df[df['datetime'] >= start].reset_index(drop=True) for df in dfs]
+
+    def _get_features_parallel(self, data, weather, market_type, task='train', n_jobs=-1, weather_block=None):
+        """
+        This method creates the same features as `_get_features`, computing month partitions in a process pool.
+        Every partition carries a halo of the rows before it (for lags and rolling windows) and after it (for the
+        target), so the stitched result is identical to the serial one. EWMAs depend on the whole history, so they
+        and the rolling means are computed once over the full series and written over the partition values.
+
+        Args:
+        - data: Merged DataFrame containing data
+        - weather: DataFrame containing weather data
+        - market_type: Type of market ('dam' or 'rtm')
+        - task: Task type ('train' or 'test')
+        - n_jobs: Number of worker processes (-1 for all cores)
+        - weather_block: Precomputed weather features from `weather_block`, shifted like the weather data
+
+        Returns:
+        - DataFrame with the final set of features
+        """
+        try:
+            data = data.reset_index(drop=True)
+            data['_row'] = np.arange(len(data))
+            back, forward = self._halo_rows(), 96 * 2
+
+            months = data['datetime'].dt.to_period('M').to_numpy()
+            starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+            bounds = list(zip(starts, np.r_[starts[1:], len(data)]))
+            parts = [data.iloc[max(0, start - back):min(len(data), end + forward)].copy() for start, end in bounds]
+
+            # workers only need the weather column names, and the whole days of the weather block that their partition
+            # covers; whole days, since the block's daily means are only used where a day has the same rows in both
+            blocks = [None] * len(parts)
+            if weather_block is not None:
+                blocks = [weather_block[weather_block['datetime'].between(part['datetime'].iloc[0].normalize(),
+                                                                          part['datetime'].iloc[-1].normalize() + pd.Timedelta(days=1),
+                                                                          inclusive='left')]
+                          for part in parts]
+            results = Parallel(n_jobs=n_jobs, backend='loky')(
+                delayed(self._get_features)(part, weather.iloc[:0], market_type, task, block) for part, block in zip(parts, blocks))
+            if any(result is None for result in results):
+                raise RuntimeError('feature creation failed in a partition')
+            results = [result[(result['_row'] >= start) & (result['_row'] < end)] for result, (start, end) in zip(results, bounds)]
+            features = pd.concat(results, ignore_index=True)
+
+            # full-history EWMAs and rolling means in place of the partition-local ones
+            history = self._compact_inputs(data[[f'mcp_{market_type}']].copy())
+            history = self._mean(self._ema(history, market_type), market_type)
+            rows = features['_row'].to_numpy()
+            for column in history.columns[1:]:
+                features[column] = history[column].to_numpy()[rows]
+            return features.drop('_row', axis=1)
+        except Exception as e:
+            print(f'Error while creating parallel features for {market_type}: ', str(e))
+            training_logs.error('Error while creating parallel features for %s: %s', market_type, str(e))
+
+    def _get_inference_features(self, data, weather, market_type, days=1, tolerance=1e-6, features=None, weather_block=None):
+        """
+        This method creates the features of the last days only, from the minimal look-back window.
+        The result matches the full-history computation within the given tolerance.
+
+        Args:
+        - data: Merged DataFrame containing data
+        - weather: DataFrame containing weather data
+        - market_type: Type of market ('dam' or 'rtm')
+        - days: Number of trailing days to create features for
+        - tolerance: Largest acceptable EWMA truncation error, relative to the price range
+        - features: Names of the features to create (all features when None)
+        - weather_block: Precomputed weather features from `weather_block`, used when all features are created
+
+        Returns:
+        - DataFrame with the features of the last days
+        """
+        try:
+            rows = days * 96 + self._lookback_rows(tolerance)
+            if len(data) < rows:
+                training_logs.warning('Only %s rows available for a look-back of %s rows.', len(data), rows)
+            data = data.iloc[-rows:].copy()
+            if features is None:
+                data = self._get_features(data, weather, market_type, task='inference', weather_block=weather_block)
+            else:
+                data = self._get_selected_features(data, weather, market_type, features)
+            return data.iloc[-days * 96:].reset_index(drop=True)
+        except Exception as e:
+            print(f'Error while creating inference features for {market_type}: ', str(e))
+            training_logs.error('Error while creating inference features for %s: %s', market_type, str(e))
+
+    def _group_stat(self, df, keys, column, stat):
+        """
+        This method broadcasts a grouped statistic of one column back to the rows.
+        """
+        grouped = df.groupby(keys, sort=False)[column]
+        return getattr(grouped, stat)().to_numpy()[grouped.ngroup().to_numpy()]
+
+    def _feature_registry(self, data, weather, market_type):
+        """
+        This method declares every feature `_get_features` creates, together with the columns it is computed from.
+
+        Args:
+        - data: Merged DataFrame containing data
+        - weather: DataFrame containing weather data
+        - market_type: Type of market ('dam' or 'rtm')
+
+        Returns:
+        - FeatureRegistry of all features
+        """
+        registry = FeatureRegistry()
+
+        def add(name, inputs, func):
+            registry.register(name, inputs, lambda df: self._cast(name, func(df)))
+
+        mcp = f'mcp_{market_type}'
+        periods = {'tb': 96, 'hour': 24, 'dow': 6, 'doy': 366}
+
+        # calendar
+        add('capping', ['datetime'], lambda df: self._capping(df[['datetime']].copy())['capping'])
+        add('date', ['datetime'], lambda df: pd.to_datetime(df['datetime'].dt.date))
+        add('hour', ['datetime'], lambda df: df['datetime'].dt.hour + 1)
+        add('dom', ['datetime'], lambda df: df['datetime'].dt.day)
+        add('month', ['datetime'], lambda df: df['datetime'].dt.month)
+        add('year', ['datetime'], lambda df: df['datetime'].dt.year)
+        add('dow', ['datetime'], lambda df: df['datetime'].dt.dayofweek)
+        add('doy', ['datetime'], lambda df: df['datetime'].dt.dayofyear)
+        add('tb', ['datetime'], lambda df: (df['datetime'].dt.hour * 60 + df['datetime'].dt.minute) // 15 + 1)
+        add('next_day_sunday', ['dow'], lambda df: np.where(df['dow'] == 5, 1, 0))
+        add('hour_dow', ['hour', 'dow'], lambda df: df['hour'].astype('int32') * df['dow'])
+        add('isMorning', ['datetime'], lambda df: df['datetime'].dt.hour.between(6, 9).astype(int))
+        add('isDay', ['datetime'], lambda df: df['datetime'].dt.hour.between(10, 16).astype(int))
+        add('isEvening', ['datetime'], lambda df: df['datetime'].dt.hour.between(17, 23).astype(int))
+        add('isNight', ['datetime'], lambda df: ((df['datetime'].dt.hour == 24) | df['datetime'].dt.hour.between(1, 5)).astype(int))
+        add('winter', ['month'], lambda df: df['month'].isin([12, 1, 2]).astype(int))
+        add('summer', ['month'], lambda df: df['month'].between(3, 6).astype(int))
+        add('monsoon', ['month'], lambda df: df['month'].between(7, 8).astype(int))
+        add('autumn', ['month'], lambda df: ((df['month'] >= 9) & (df['month'] == 11)).astype(int))
+        for feature, period in periods.items():
+            add(f'cos_{feature}', [feature], lambda df, f=feature, p=period: np.cos(2 * math.pi * df[f] / p))
+            add(f'sin_{feature}', [feature], lambda df, f=feature, p=period: np.sin(2 * math.pi * df[f] / p))
+
+        # price
+        add('target', [mcp], lambda df: df[mcp].shift(-96) if market_type == 'dam' else df[mcp].shift(-96 * 2))
+        for column in data.columns[1:11]:
+            for i in range(1, 6):
+                add(f'change_in_{column}_wrt_day_{i}', [column], lambda df, c=column, i=i: df[c].shift(96 * i))
+            for i in [1, 2, 4, 8, 12, 18]:
+                add(f'{column}_lag_{i}h', [column], lambda df, c=column, i=i: df[c].shift(i * 4))
+            add(f'hour_mean_{column}', [column, 'date', 'hour'], lambda df, c=column: self._group_stat(df, ['date', 'hour'], c, 'mean'))
+            for stat in ['mean', 'min', 'max']:
+                add(f'daily_{stat}_{column}', [column, 'date'], lambda df, c=column, s=stat: self._group_stat(df, ['date'], c, s))
+        for i in [1, 3, 6, 12]:
+            add(f'ewma_{i}h', [mcp], lambda df, i=i: df[mcp].ewm(span=4 * i).mean())
+        for i in [1, 3, 5]:
+            add(f'ewma_{i}d', [mcp], lambda df, i=i: df[mcp].ewm(span=96 * i).mean())
+        for window_size in [2, 3, 5]:
+            add(f'{mcp}_mean_{window_size}d', [mcp], lambda df, w=window_size: df[mcp].rolling(w * 96).mean())
+        for feature in ['dom', 'month', 'dow', 'doy', 'tb']:
+            add(f'{mcp}_with_{feature}', [mcp, feature], lambda df, f=feature: df[mcp] * df[f])
+
+        # weather
+        weather_columns = list(weather.columns[1:65])
+        for column in weather_columns:
+            add(f'daily_mean_{column}', [column, 'date'], lambda df, c=column: self._group_stat(df, ['date'], c, 'mean'))
+            for i in range(1, 4):
+                add(f'change_in_{column}_wrt_day_{i}', [column], lambda df, c=column, i=i: df[c] - df[c].shift(96 * i))
+            add(f'{mcp}_with_{column}', [mcp, column], lambda df, c=column: df[mcp] * df[c])
+        prec_columns = [column for column in data.columns if column.startswith('prec_')]
+        add('prec_tb', prec_columns, lambda df: df[prec_columns].sum(axis=1) * len(weather_columns))
+        return registry
+
+    def _get_selected_features(self, data, weather, market_type, features, task='inference'):
+        """
+        This method computes only the requested features and the features they depend on.
+
+        Args:
+        - data: Merged DataFrame containing data
+        - weather: DataFrame containing weather data
+        - market_type: Type of market ('dam' or 'rtm')
+        - features: Names of the features to create (e.g. the model's best features)
+        - task: Task type ('train' adds the target)
+
+        Returns:
+        - DataFrame with datetime and the requested features
+        """
+        try:
+            names = list(features) + (['target'] if task == 'train' else [])
+            registry = self._feature_registry(data, weather, market_type)
+            data = registry.compute(self._compact_inputs(data.reset_index(drop=True)), names)
+            data = data[['datetime'] + names].dropna()
+            data = data.reset_index(drop=True)
+            return data
+        except Exception as e:
+            print(f'Error while creating selected features for {market_type}: ', str(e))
+            training_logs.error('Error while creating selected features for %s: %s', market_type, str(e))
+
+    def _get_features(self, data, weather, market_type, task='train', weather_block=None):
         """
         This method retrieves the final set of features for model training or testing.
 
@@ -348,17 +1008,21 @@ class FeatureEngineering:
         - weather: DataFrame containing weather data
         - market_type: Type of market ('dam' or 'rtm')
         - task: Task type ('train' or 'test')
+        - weather_block: Precomputed weather features from `weather_block`, shifted like the weather data
 
         Returns:
         - DataFrame with the final set of features
         """
         try:
+            data = self._compact_inputs(data)
             data = self._price_features(data, market_type, task)
-            data = self._weather_features(data, weather)
+            data = self._weather_features(data, weather, weather_block)
             data = self._interaction_features(data, weather, market_type)
             data = data.drop('date', axis=1)
             data = data.dropna()
             data = data.reset_index(drop=True)
+            if self.compact:
+                self.memory_report(data)
             return data
         except Exception as e:
             print(f'Error while creating features for {market_type}: ', str(e))
@@ -0,0 +1,175 @@
+'''
+This script persists the feature matrix of each market so that training and forecasting runs only
+compute features for rows that are new since the previous run.
+It includes a class `FeatureStore` which keeps the inference feature matrix in a partitioned store keyed by
+market type and a hash of the feature definitions, and extends it using only the new or changed days plus a
+look-back halo. Every source day is checksummed, so values revised in place (backfills, repaired slots,
+overwritten weather forecasts) are recomputed as well as appended rows.
+
+Author: Aman Bhatt
+'''
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+from config.paths import *
+from src.utils import *
+from src.data_storage.partitioned_store import PartitionedStore
+from src.feature_engineering import build_features
+
+training_logs = configure_logger(LOGS_PATH, 'training.log')
+
+
+class FeatureStore:
+    def __init__(self, path, market_type, feature_engineering, tolerance=1e-6):
+        """
+        Initializes the FeatureStore of one market.
+
+        Args:
+            path (str): Directory holding all feature stores.
+            market_type (str): Type of market ('dam' or 'rtm').
+            feature_engineering (FeatureEngineering): Instance used to compute features.
+            tolerance (float): Largest acceptable EWMA truncation error of incrementally computed rows,
+                               relative to the price range.
+        """
+        self.path = path
+        self.market_type = market_type
+        self.featured_data = feature_engineering
+        self.tolerance = tolerance
+        self.store = None
+
+    def _feature_hash(self, data, weather):
+        """
+        Hashes the feature definitions, the input schema and the dtype mode; any change starts a new store.
+
+        Args:
+            data (pd.DataFrame): Merged input data.
+            weather (pd.DataFrame): Weather data whose columns drive the weather features.
+
+        Returns:
+            str: Short hex digest.
+        """
+        digest = hashlib.sha1(inspect.getsource(build_features).encode())
+        digest.update(json.dumps([list(data.columns), list(weather.columns), self.featured_data.compact]).encode())
+        return digest.hexdigest()[:12]
+
+    def _open(self, data, weather):
+        """
+        Opens the store matching the current feature definitions and removes stale versions of it.
+        """
+        name = f'{self.market_type}_{self._feature_hash(data, weather)}'
+        self.store = PartitionedStore(self.path, name)
+        if os.path.exists(self.path):
+            for stale in os.listdir(self.path):
+                if stale.startswith(f'{self.market_type}_') and stale != name:
+                    shutil.rmtree(os.path.join(self.path, stale), ignore_errors=True)
+                    training_logs.info('Stale feature store %s removed.', stale)
+        return self.store
+
+    def _rebuild(self, data, weather, weather_block=None):
+        """
+        Computes the feature matrix of the whole history.
+        """
+        self.store.clear()
+        features = self.featured_data._get_features(data.copy(), weather, self.market_type, task='inference',
+                                                    weather_block=weather_block)
+        self.store.upsert(features)
+        return len(features)
+
+    def update(self, data, weather, weather_block=None):
+        """
+        Brings the stored feature matrix up to date with the merged input data. Rows from the first day whose source
+        checksum changed (or that is new) onwards are computed, from a look-back halo of history; the whole matrix is
+        rebuilt when the feature definitions changed or stored days disappeared from the source.
+
+        Args:
+            data (pd.DataFrame): Merged input data.
+            weather (pd.DataFrame): Weather data whose columns drive the weather features.
+            weather_block (pd.DataFrame): Precomputed weather features, shifted like the weather data.
+
+        Returns:
+            int: Number of feature rows computed.
+
+        Raises:
+            Exception: Any error of the update, after logging it, so that a stale matrix is never loaded.
+        """
+        try:
+            data = data.reset_index(drop=True)
+            self._open(data, weather)
+            stored_days = self.store.metadata().get('source_days')
+            source_days = day_checksums(data)
+            halo = self.featured_data._lookback_rows(self.tolerance)
+
+            changed = [day for day, checksum in source_days.items() if (stored_days or {}).get(day) != checksum]
+            if stored_days is None or set(stored_days) - set(source_days):
+                # no store yet, or days were removed from already featurised history
+                rows = self._rebuild(data, weather, weather_block)
+                training_logs.info('%s feature store rebuilt: %s rows.', self.market_type, rows)
+            elif not changed:
+                return 0
+            else:
+                # recompute from the whole first changed day so that daily statistics see the complete day
+                day_start = pd.Timestamp(changed[0])
+                if changed[0] <= max(stored_days):
+                    print(f'{self.market_type} source data changed from {changed[0]}; recomputing features from there.')
+                    training_logs.warning('%s source data changed from %s (%s stored days revised); features recomputed from there.',
+                                          self.market_type, changed[0], sum(day in stored_days for day in changed))
+                first = int((data['datetime'] < day_start).sum())
+                if first < halo:
+                    rows = self._rebuild(data, weather, weather_block)
+                else:
+                    window = data.iloc[first - halo:].copy()
+                    features = self.featured_data._get_features(window, weather, self.market_type, task='inference',
+                                                                weather_block=weather_block)
+                    features = features[features['datetime'] >= day_start]
+                    self.store.append(features)
+                    rows = len(features)
+                training_logs.info('%s feature store extended by %s rows.', self.market_type, rows)
+
+            self.store.set_metadata(source_days=source_days, source_last=str(data['datetime'].iloc[-1]))
+            print(f'{self.market_type} features updated: {rows} rows computed.')
+            return rows
+        except Exception as e:
+            print(f'Error while updating {self.market_type} feature store: ', str(e))
+            training_logs.error('Error while updating %s feature store: %s', self.market_type, str(e))
+            raise
+
+    def load(self, start_date=None, end_date=None, columns=None, mmap_mode=None):
+        """
+        Loads the stored inference feature matrix.
+
+        Args:
+            start_date (str or datetime): First timestamp to load.
+            end_date (str or datetime): Timestamp to load up to, excluded.
+            columns (list): Feature columns to return alongside datetime (all when None).
+            mmap_mode (str): Memory-map mode passed to np.load (None reads into memory).
+
+        Returns:
+            pd.DataFrame: Feature matrix.
+        """
+        features = self.store.load(start_date, end_date, mmap_mode)
+        if columns is not None:
+            features = features[['datetime'] + list(columns)]
+        return features
+
+    def load_training(self):
+        """
+        Loads the stored feature matrix with the target added, laid out like `_get_features(task='train')`.
+
+        Returns:
+            pd.DataFrame: Training data.
+        """
+        features = self.store.load()
+        mcp = features[f'mcp_{self.market_type}']
+        target = mcp.shift(-96) if self.market_type == 'dam' else mcp.shift(-96 * 2)
+        features.insert(features.columns.get_loc('autumn') + 1, 'target', target)
+        return features.dropna().reset_index(drop=True)
@@ -0,0 +1,200 @@
+'''
+This script keeps the price-history features of a market as an online state that is updated block by block.
+It includes a class `StreamingState` which holds a ring buffer of recent prices, the EWMA numerators and
+denominators, and compensated running sums and valid counts of the rolling windows, so that each new 15-minute
+observation costs constant time and the values match the batch `_ema`, `_mean` and `_lags` features. Missing
+prices are skipped the way pandas skips them, so the state recovers after a gap like the batch path does.
+
+Author: Aman Bhatt
+'''
+
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+from config.paths import LOGS_PATH
+from src.utils import *
+
+training_logs = configure_logger(LOGS_PATH, 'training.log')
+
+
+class StreamingState:
+    def __init__(self, market_type):
+        """
+        Initializes an empty StreamingState for the price of one market.
+
+        Args:
+            market_type (str): Type of market ('dam' or 'rtm').
+        """
+        self.market_type = market_type
+        column = f'mcp_{market_type}'
+
+        # same spans, windows and shifts as FeatureEngineering._ema, _mean and _lags
+        self.ewma_spans = {**{f'ewma_{i}h': 4 * i for i in [1, 3, 6, 12]}, **{f'ewma_{i}d': 96 * i for i in [1, 3, 5]}}
+        self.mean_windows = {f'{column}_mean_{w}d': 96 * w for w in [2, 3, 5]}
+        self.lags = {**{f'change_in_{column}_wrt_day_{i}': 96 * i for i in range(1, 6)},
+                     **{f'{column}_lag_{i}h': 4 * i for i in [1, 2, 4, 8, 12, 18]}}
+
+        # the buffer holds the current value and everything a lag or window needs to look back to
+        self.capacity = max(list(self.mean_windows.values()) + list(self.lags.values())) + 1
+        self.buffer = np.full(self.capacity, np.nan)
+        self.count = 0
+        self.last_datetime = None
+
+        self.ewma_numerator = {name: 0.0 for name in self.ewma_spans}
+        self.ewma_denominator = {name: 0.0 for name in self.ewma_spans}
+        self.sums = {name: 0.0 for name in self.mean_windows}
+        self.compensations = {name: 0.0 for name in self.mean_windows}
+        self.valid_counts = {name: 0 for name in self.mean_windows}
+
+    @property
+    def feature_names(self):
+        """
+        Names of the features produced, in output order.
+        """
+        return list(self.ewma_spans) + list(self.mean_windows) + list(self.lags)
+
+    def _add(self, name, value):
+        """
+        Adds a value to a running sum with Kahan compensation, so that long streams do not drift.
+        """
+        y = value - self.compensations[name]
+        total = self.sums[name] + y
+        self.compensations[name] = (total - self.sums[name]) - y
+        self.sums[name] = total
+
+    def _ingest(self, value):
+        """
+        Ingests one observation and returns its feature values.
+
+        Args:
+            value (float): Price of the new 15-minute slot (NaN when missing).
+
+        Returns:
+            list: Feature values in `feature_names` order.
+        """
+        position = self.count % self.capacity
+        self.buffer[position] = value
+        self.count += 1
+        row = []
+
+        # adjust=True EWMA: weighted sum over weight sum, both decayed by (1 - alpha) per slot; a missing price
+        # decays the weights without adding to them (pandas' ignore_na=False), so the value carries over
+        valid = not np.isnan(value)
+        for name, span in self.ewma_spans.items():
+            decay = 1 - 2 / (span + 1)
+            self.ewma_numerator[name] = decay * self.ewma_numerator[name] + (value if valid else 0.0)
+            self.ewma_denominator[name] = decay * self.ewma_denominator[name] + (1.0 if valid else 0.0)
+            denominator = self.ewma_denominator[name]
+            row.append(self.ewma_numerator[name] / denominator if denominator > 0 else np.nan)
+
+        # windows sum their valid prices only and, like rolling(window).mean(), need every slot of the window valid
+        for name, window in self.mean_windows.items():
+            if valid:
+                self._add(name, value)
+                self.valid_counts[name] += 1
+            if self.count > window:
+                leaving = self.buffer[(position - window) % self.capacity]
+                if not np.isnan(leaving):
+                    self._add(name, -leaving)
+                    self.valid_counts[name] -= 1
+            row.append(self.sums[name] / window if self.valid_counts[name] >= window else np.nan)
+
+        for name, shift in self.lags.items():
+            row.append(self.buffer[(position - shift) % self.capacity] if self.count > shift else np.nan)
+        return row
+
+    def update(self, datetimes, values):
+        """
+        Ingests a block of new observations; observations at or before the last ingested datetime are skipped,
+        so the same block can be passed again safely.
+
+        Args:
+            datetimes (array-like): Datetimes of the observations, increasing.
+            values (array-like): Prices of the observations.
+
+        Returns:
+            pd.DataFrame: Datetime and the features of every ingested observation.
+        """
+        datetimes = pd.to_datetime(pd.Series(datetimes)).reset_index(drop=True)
+        values = np.asarray(values, dtype='float64')
+        if self.last_datetime is not None:
+            new = (datetimes > self.last_datetime).to_numpy()
+            datetimes, values = datetimes[new].reset_index(drop=True), values[new]
+
+        rows = [self._ingest(value) for value in values]
+        if len(values):
+            self.last_datetime = datetimes.iloc[-1]
+        features = pd.DataFrame(rows, columns=self.feature_names, dtype='float64')
+        features.insert(0, 'datetime', datetimes)
+        return features
+
+    def to_dict(self):
+        """
+        Returns the state as a json-serializable dictionary.
+        """
+        return {
+            'market_type': self.market_type,
+            'count': self.count,
+            'last_datetime': str(self.last_datetime) if self.last_datetime is not None else None,
+            'buffer': [None if np.isnan(value) else float(value) for value in self.buffer],
+            'ewma_numerator': self.ewma_numerator,
+            'ewma_denominator': self.ewma_denominator,
+            'sums': self.sums,
+            'compensations': self.compensations,
+            'valid_counts': self.valid_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Restores a state saved with `to_dict`.
+        """
+        streaming_state = cls(state['market_type'])
+        streaming_state.count = state['count']
+        streaming_state.last_datetime = pd.Timestamp(state['last_datetime']) if state['last_datetime'] else None
+        streaming_state.buffer = np.array([np.nan if value is None else value for value in state['buffer']], dtype='float64')
+        streaming_state.ewma_numerator = dict(state['ewma_numerator'])
+        streaming_state.ewma_denominator = dict(state['ewma_denominator'])
+        streaming_state.sums = dict(state['sums'])
+        streaming_state.compensations = dict(state['compensations'])
+        streaming_state.valid_counts = dict(state['valid_counts'])
+        return streaming_state
+
+    def save(self, path, file_name):
+        """
+        Saves the state as json.
+
+        Args:
+            path (str): Directory to save into.
+            file_name (str): Name of the file, without extension.
+        """
+        try:
+            os.makedirs(path, exist_ok=True)
+            tmp_path = os.path.join(path, f'{file_name}.json.tmp')
+            with open(tmp_path, 'w') as file:
+                json.dump(self.to_dict(), file)
+            os.replace(tmp_path, os.path.join(path, f'{file_name}.json'))
+        except Exception as e:
+            print('Error while saving streaming state: ', str(e))
+            training_logs.error('Error while saving streaming state: %s', str(e))
+
+    @classmethod
+    def load(cls, path, file_name):
+        """
+        Loads a state saved with `save`.
+
+        Args:
+            path (str): Directory the state was saved into.
+            file_name (str): Name of the file, without extension.
+
+        Returns:
+            StreamingState: Restored state.
+        """
+        with open(os.path.join(path, f'{file_name}.json'), 'r') as file:
+            return cls.from_dict(json.load(file))
@@ -7,7 +7,6 @@ Author: Aman Bhatt
 import os
 import pandas as pd
 import sys
-import requests
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -17,19 +16,17 @@ PROJECT_PATH = os.getenv('PROJECT_DIR')
 sys.path.append(PROJECT_PATH)
 
 # %%
-from src.data_ingestion.iex_data import IexDataFetcher
+from src.get_apis.iex_client import get_iex_client
 from src.utils import *
 from config.paths import *
 
 accuracy_logs = configure_logger(LOGS_PATH, 'accuracy.log')
-# %%
-iex_data = IexDataFetcher()
 
 # %%
 class IexForecast:
     def __init__(self):
-        # Access credentials
-        self.base_url = os.getenv('base_url')
+        # shared api client (credentials, cached token and pooled connections)
+        self.client = get_iex_client()
     
     def _get_forecast_json(self, start_date_str, end_date_str, market_type):
         """
@@ -44,12 +41,9 @@ class IexForecast:
             dict: JSON response from the API.
         """
         try:
-            token = iex_data._get_token()
             endpoint = 'getPriceForecast' if market_type == 'dam' else 'getRTMPriceForecast'
-            url = self.base_url + endpoint
-            headers = {'Authorization': 'Bearer ' + token, 'Content-Type': 'application/json'}
             params = {"start_date": start_date_str, "end_date": end_date_str}
-            r = requests.get(url=url, headers=headers, params=params)
+            r = self.client.get(endpoint, params=params)
             return r.json()
         except Exception as e:
             print(f"Error occurred while retrieving {market_type} json data:", str(e))
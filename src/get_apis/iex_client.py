@@ -0,0 +1,198 @@
+'''
+This script provides a single authenticated HTTP client shared by every IEX API caller.
+It includes a class `IexClient` which caches the access token until it expires, reuses pooled
+keep-alive connections and retries failed idempotent requests (GETs and the login) with bounded
+exponential backoff, and a `RateLimiter` used to space out concurrent requests.
+
+Author: Aman Bhatt
+'''
+
+import os
+import sys
+import json
+import time
+import base64
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Parent directory
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+# Custom modules
+from config.paths import LOGS_PATH
+from src.utils import *
+
+data_logs = configure_logger(LOGS_PATH, 'data.log')
+
+
+class IexClient:
+    def __init__(self, max_retries=3, backoff_factor=0.5, pool_maxsize=10, token_ttl=None):
+        """
+        Initializes the IexClient with credentials, a pooled session and an empty token cache.
+
+        Args:
+            max_retries (int): Maximum number of retries for failed requests.
+            backoff_factor (float): Backoff factor between retries (0.5 -> 0.5s, 1s, 2s, ...).
+            pool_maxsize (int): Maximum number of keep-alive connections kept in the pool.
+            token_ttl (int): Token lifetime in seconds, used when the login response carries
+                             no expiry (defaults to the 'iex_token_ttl' environment variable, or 3600).
+        """
+        # api credentials
+        self.base_url = os.getenv('base_url')
+        self.user_email = os.getenv('email')
+        self.user_password = os.getenv('password')
+
+        self.token_ttl = int(token_ttl or os.getenv('iex_token_ttl', 3600))
+        self.session = self._create_session(max_retries, backoff_factor, pool_maxsize)
+
+        # token cache
+        self._token = None
+        self._token_expiry = 0
+        self._lock = threading.Lock()
+
+    def _create_session(self, max_retries, backoff_factor, pool_maxsize):
+        """
+        Creates a requests session with connection pooling and retry with backoff. Only GETs and the login are
+        retried: the other POSTs save forecasts, and a retry after the server has committed one would upload it twice.
+
+        Returns:
+            requests.Session: Session shared by all requests of this client.
+        """
+        def adapter(methods):
+            retry = Retry(total=max_retries, backoff_factor=backoff_factor,
+                          status_forcelist=[429, 500, 502, 503, 504],
+                          allowed_methods=frozenset(methods), raise_on_status=False)
+            return HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter(['GET']))
+        session.mount('https://', adapter(['GET']))
+        if self.base_url:
+            # the longest matching prefix wins, so the login alone also retries its POST
+            session.mount(self.base_url + 'login', adapter(['GET', 'POST']))
+        return session
+
+    def _get_expiry(self, response, token):
+        """
+        Works out when the token expires, from the login response or the JWT 'exp' claim.
+
+        Args:
+            response (dict): JSON response of the login endpoint.
+            token (str): Access token.
+
+        Returns:
+            float: Expiry as a unix timestamp.
+        """
+        if response.get('expires_in'):
+            return time.time() + float(response['expires_in'])
+        try:
+            payload = token.split('.')[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            return float(claims['exp'])
+        except Exception:
+            return time.time() + self.token_ttl
+
+    def get_token(self, force=False):
+        """
+        Returns the cached access token, logging in again only when it is missing or about to expire.
+
+        Args:
+            force (bool): Discard the cached token and log in again.
+
+        Returns:
+            str: Access token.
+        """
+        with self._lock:
+            # refresh a minute before expiry so in-flight requests do not race the deadline
+            if force or self._token is None or time.time() >= self._token_expiry - 60:
+                url = self.base_url + 'login'
+                data = {'email': self.user_email, 'password': self.user_password}
+                response = self.session.post(url=url, data=data, verify=True).json()
+                self._token = response['access_token']
+                self._token_expiry = self._get_expiry(response, self._token)
+                data_logs.info('IEX access token refreshed.')
+            return self._token
+
+    def request(self, method, endpoint, headers=None, **kwargs):
+        """
+        Sends an authenticated request to an IEX endpoint, re-authenticating once if the token is rejected.
+
+        Args:
+            method (str): HTTP method ('GET' or 'POST').
+            endpoint (str): Endpoint name appended to the base url.
+            headers (dict): Additional request headers.
+            **kwargs: Passed on to requests.Session.request.
+
+        Returns:
+            requests.Response: Response of the request.
+        """
+        url = self.base_url + endpoint
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        headers['Authorization'] = 'Bearer ' + self.get_token()
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            headers['Authorization'] = 'Bearer ' + self.get_token(force=True)
+            response = self.session.request(method, url, headers=headers, **kwargs)
+        return response
+
+    def get(self, endpoint, **kwargs):
+        """
+        Sends an authenticated GET request to an IEX endpoint.
+        """
+        return self.request('GET', endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        """
+        Sends an authenticated POST request to an IEX endpoint.
+        """
+        return self.request('POST', endpoint, **kwargs)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        """
+        Spaces out requests made from several threads to at most `requests_per_second`.
+
+        Args:
+            requests_per_second (float): Maximum request rate (0 or None for no limit).
+        """
+        if requests_per_second is not None and requests_per_second < 0:
+            raise ValueError(f'requests_per_second must be positive, 0 or None, got {requests_per_second}')
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller may send its next request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_iex_client():
+    """
+    Returns the IexClient shared by all IEX callers of the current process.
+
+    Returns:
+        IexClient: Shared client instance.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = IexClient()
+        return _client
@@ -0,0 +1,104 @@
+'''
+This script computes the accuracy reports of published forecasts against the actual market prices.
+It includes a class `AccuracyReport` with methods to build the daily day-ahead error report and the daily
+directional hit count from merged forecast and actual data.
+
+Author: Aman Bhatt
+'''
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+PROJECT_PATH = os.getenv('PROJECT_DIR')
+sys.path.append(PROJECT_PATH)
+
+from config.paths import LOGS_PATH
+from src.utils import *
+
+accuracy_logs = configure_logger(LOGS_PATH, 'accuracy.log')
+
+
+class AccuracyReport:
+    def __init__(self):
+        """
+        Initializes the AccuracyReport with the sessions of the day, as time-block positions.
+        """
+        sessions = np.empty(96, dtype=object)
+        sessions[:] = 'Night'
+        sessions[6 * 4:10 * 4] = 'Morning'
+        sessions[10 * 4:17 * 4] = 'Day'
+        sessions[17 * 4:23 * 4] = 'Evening'
+        self.sessions = sessions
+        self.columns = ['Date', 'MAE', 'Morning_MAE', 'Day_MAE', 'Evening_MAE', 'Night_MAE', 'MAPE']
+
+    def price_accuracy(self, df, market_type='dam'):
+        """
+        Computes the daily MAE, the MAE of every session and the MAPE of a price forecast.
+
+        Args:
+            df (pd.DataFrame): Merged data with datetime, forecast and the actual mcp of the market.
+            market_type (str): Type of market ('dam' or 'rtm').
+
+        Returns:
+            pd.DataFrame: One row per day with the columns of the accuracy report.
+        """
+        try:
+            df = df.reset_index(drop=True)
+            actual = df[f'mcp_{market_type}'].to_numpy(dtype='float64')
+            error = np.abs(df['forecast'].to_numpy(dtype='float64') - actual)
+            dates = df['datetime'].dt.date
+
+            # sessions are the 15-minute time blocks of the day, so days with missing rows keep their sessions
+            slot = (df['datetime'].dt.hour * 4 + df['datetime'].dt.minute // 15).to_numpy()
+            errors = pd.DataFrame({'date': dates, 'session': self.sessions[slot],
+                                   'error': error, 'ape': error / actual})
+            daily = errors.groupby('date', sort=False)
+            sessions = errors.pivot_table(index='date', columns='session', values='error', aggfunc='mean', sort=False)
+
+            report = pd.DataFrame({'Date': [date.strftime('%d-%m-%Y') for date in daily.size().index],
+                                   'MAE': np.round(daily['error'].mean().to_numpy(), 2)})
+            for session in ['Morning', 'Day', 'Evening', 'Night']:
+                values = sessions[session] if session in sessions else pd.Series(np.nan, index=sessions.index)
+                report[f'{session}_MAE'] = np.round(values.reindex(daily.size().index).to_numpy(), 2)
+            report['MAPE'] = np.round(daily['ape'].mean().to_numpy() * 100, 2)
+            return report[self.columns]
+        except Exception as e:
+            print(f'Error while creating {market_type} accuracy report: ', str(e))
+            accuracy_logs.error('Error while creating %s accuracy report: %s', market_type, str(e))
+
+    def directional_actual(self, df):
+        """
+        Labels the actual direction of every time block: 1 when the day-ahead price is above the real-time price,
+        0 when it is below and -1 when they are equal.
+
+        Args:
+            df (pd.DataFrame): Merged data with datetime, mcp_dam and mcp_rtm.
+
+        Returns:
+            pd.DataFrame: Datetime and the actual direction.
+        """
+        try:
+            dam, rtm = df['mcp_dam'].to_numpy(), df['mcp_rtm'].to_numpy()
+            actual = np.select([dam > rtm, dam < rtm], [1, 0], default=-1)
+            return pd.DataFrame({'datetime': df['datetime'].to_numpy(), 'actual': actual})
+        except Exception as e:
+            print('Error while creating directional actuals: ', str(e))
+            accuracy_logs.error('Error while creating directional actuals: %s', str(e))
+
+    def directional_accuracy(self, df):
+        """
+        Counts the time blocks of every day whose direction was forecast correctly.
+
+        Args:
+            df (pd.DataFrame): Merged data with datetime, forecast and actual.
+
+        Returns:
+            pd.DataFrame: One row per day with Date and Accuracy.
+        """
+        try:
+            hits = (df['actual'] == df['forecast']).astype(int)
+            return hits.groupby(df['datetime'].dt.date.rename('Date')).sum().rename('Accuracy').reset_index()
+        except Exception as e:
+            print('Error while creating directional accuracy report: ', str(e))
+            accuracy_logs.error('Error while creating directional accuracy report: %s', str(e))
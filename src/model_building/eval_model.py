@@ -130,3 +130,32 @@ class ModelEvaluator:
         except Exception as e:
             print('Error while evaluating model: ', str(e))
             training_logs.error('Error while evaluating model: %s', str(e))
+
+    def check_prediction_tolerance(self, X_reference, X_compact, tolerance=0.001):
+        """
+        Checks that the model predicts the same from a compact (float32 / small-int) feature matrix
+        as from the full-precision one. The model should be trained on compact features, so that its split
+        thresholds are placed between float32 values.
+
+        Args:
+            X_reference (pd.DataFrame): Input features at full precision.
+            X_compact (pd.DataFrame): The same rows built in compact dtype mode.
+            tolerance (float): Largest acceptable mean absolute difference, relative to the mean absolute prediction.
+
+        Returns:
+            bool: Whether the predictions agree within the tolerance.
+        """
+        try:
+            reference = self.model.predict(X_reference[self.best_features])
+            compact = self.model.predict(X_compact[self.best_features])
+            difference = np.abs(reference - compact)
+            relative = difference.mean() / max(np.abs(reference).mean(), 1e-12)
+            within = relative <= tolerance
+            print(f'  Compact prediction difference: mean {relative:.2e} relative, max {difference.max():.4f} absolute.')
+            training_logs.info('  Compact prediction difference: mean %.2e relative, max %.4f absolute.', relative, difference.max())
+            if not within:
+                training_logs.warning('  Compact predictions differ by more than %s.', tolerance)
+            return within
+        except Exception as e:
+            print('Error while checking compact predictions: ', str(e))
+            training_logs.error('Error while checking compact predictions: %s', str(e))
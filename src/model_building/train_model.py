@@ -5,10 +5,17 @@ Author: Aman Bhatt
 '''
 import lightgbm as lgb
 import optuna
+import numpy as np
 import pandas as pd
 from sklearn.metrics import mean_absolute_percentage_error
 import warnings, os
+import json
+import time
+import glob
+import uuid
 from contextlib import redirect_stdout, redirect_stderr
+from joblib import Parallel, delayed
+from optuna.trial import TrialState
 import logging
 
 # Suppress INFO messages from Optuna
@@ -17,19 +24,85 @@ optuna_logger.setLevel(logging.WARNING)
 
 from config.paths import *
 from src.utils import *
+from src.model_building.binned_dataset import BinnedDatasetCache
 
 training_logs = configure_logger(LOGS_PATH, 'training.log')
 
+
+def journal_storage(path):
+    """
+    Open an Optuna journal file storage, which several processes can share without a database server.
+
+    Args:
+        path (str): Path of the journal file.
+
+    Returns:
+        optuna.storages.JournalStorage: The storage.
+    """
+    try:
+        from optuna.storages.journal import JournalFileBackend   # optuna >= 4.0
+    except ImportError:
+        from optuna.storages import JournalFileStorage as JournalFileBackend   # optuna 3.x
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=optuna.exceptions.ExperimentalWarning)
+        return optuna.storages.JournalStorage(JournalFileBackend(path))
+
+class BoosterRegressor:
+    """
+    A booster trained with `lgb.train` on a binned dataset, with the `predict` and `booster_` interface of
+    LGBMRegressor that the evaluation and forecasting code use.
+    """
+    def __init__(self, booster):
+        self.booster_ = booster
+
+    @property
+    def feature_name_(self):
+        return self.booster_.feature_name()
+
+    @property
+    def feature_importances_(self):
+        return self.booster_.feature_importance()
+
+    def predict(self, X):
+        """
+        Predict with the float32 features the booster was trained on.
+        """
+        features = np.ascontiguousarray(np.asarray(X, dtype='float32'))
+        return self.booster_.predict(features, num_iteration=self.booster_.best_iteration or None)
+
+
 class ModelTraining:
 
-    def __init__(self, PROJECT_PATH):
+    def __init__(self, PROJECT_PATH, pruner='median', subsample_days=None, subsample_trials=10, report_every=10,
+                 skip_drift=0.02, shrink_drift=0.1, min_trials=10, warm_trials=3, max_skips=6):
         """
         Initialize the ModelTraining class.
 
         Args:
             PROJECT_PATH (str): Path to the project directory.
+            pruner (str): Pruner stopping unpromising tuning trials ('median', 'halving' or None).
+            subsample_days (float): Fraction of the training days the first tuning trials are scored on
+                                    (None trains every trial on all days).
+            subsample_trials (int): Number of first trials scored on the subsample.
+            report_every (int): Boosting rounds between the validation MAPEs reported to the pruner.
+            skip_drift (float): Data drift since the last tuning below which its parameters are reused as they are.
+            shrink_drift (float): Data drift below which the trial budget shrinks to `min_trials`.
+            min_trials (int): Trial budget of a warm-started study on data that drifted little.
+            warm_trials (int): Number of the previous best configurations the new study starts with.
+            max_skips (int): Number of consecutive runs that may reuse the previous tuning before a study runs again.
         """
         self.PROJECT_PATH = PROJECT_PATH
+        self.pruner = pruner
+        self.subsample_days = subsample_days
+        self.subsample_trials = subsample_trials
+        self.report_every = report_every
+        self.skip_drift = skip_drift
+        self.shrink_drift = shrink_drift
+        self.min_trials = min_trials
+        self.warm_trials = warm_trials
+        self.max_skips = max_skips
+        self.last_trials = []
+        self.datasets = BinnedDatasetCache(DATASETS_PATH)
 
     def _split_data(self, data, training_cutoff, validation_cutoff):
         """
@@ -84,9 +157,10 @@ class ModelTraining:
                     'verbose': -1,    # no detailed logging will be displayed 
                     'categorical_feature': ''     # specify categorical features
                     }
-            lgb_train = lgb.Dataset(X_train, y_train)
-            lgb_eval = lgb.Dataset(X_valid, y_valid, reference=lgb_train)
-            model = lgb.train(params, lgb_train, valid_sets=lgb_eval, num_boost_round=1000, early_stopping_rounds=10, verbose_eval=False)
+            lgb_train = self.datasets.get('select_train', X_train, y_train)
+            lgb_eval = self.datasets.get('select_valid', X_valid, y_valid, reference=lgb_train)
+            model = lgb.train(params, lgb_train, valid_sets=[lgb_eval], num_boost_round=1000,
+                              callbacks=[lgb.early_stopping(10, verbose=False)])
             # creating a dataframe for feature importances
             imp_feat = pd.DataFrame({'features': model.feature_name(), 
                                 'importance': model.feature_importance()})
@@ -103,9 +177,208 @@ class ModelTraining:
             training_logs.error('Error while finding features: %s', str(e))
 
 
-    def _hyperparameter_tuning(self, X_train, y_train, X_valid, y_valid, n_trials, best_features):
+    def _cpu_split(self, n_trials, n_jobs=-1):
         """
-        Perform hyperparameter tuning using Optuna.
+        Split a CPU budget between concurrent tuning trials and LightGBM threads per trial.
+        Trials run in separate processes, which scales better than more threads on one small fit,
+        so the budget goes to trials first and the cores left over go to each trial's LightGBM threads.
+
+        Args:
+            n_trials (int): Number of trials to run.
+            n_jobs (int): CPU budget (-1 for all cores).
+
+        Returns:
+            tuple: Number of worker processes and LightGBM threads per trial.
+        """
+        budget = os.cpu_count() if n_jobs is None or n_jobs < 1 else n_jobs
+        workers = max(1, min(n_trials, budget))
+        return workers, max(1, budget // workers)
+
+    def _open_study(self, storage_path, study_name, best_features):
+        """
+        Create a study in a journal file, or load it to resume an interrupted run. A stored study tuned on
+        other features is started over, since its trials are not comparable.
+
+        Args:
+            storage_path (str): Path of the journal file.
+            study_name (str): Name of the study.
+            best_features (list): List of best features.
+
+        Returns:
+            optuna.Study: The study.
+        """
+        storage = journal_storage(storage_path)
+        study = optuna.create_study(study_name=study_name, storage=storage, direction='minimize', load_if_exists=True)
+        if study.user_attrs.get('features', best_features) != best_features:
+            training_logs.info('Study %s was tuned on other features; starting it over.', study_name)
+            optuna.delete_study(study_name=study_name, storage=storage)
+            study = optuna.create_study(study_name=study_name, storage=storage, direction='minimize')
+        study.set_user_attr('features', best_features)
+        return study
+
+    def _clear_journals(self, max_age_days=7):
+        """
+        Removes the study journals not written to for a number of days, i.e. those of finished studies and of
+        runs that were never resumed.
+
+        Args:
+            max_age_days (float): Age in days after which unused journals are removed.
+        """
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        for file_path in glob.glob(os.path.join(TUNING_PATH, '*.journal')):
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+
+    def _make_pruner(self):
+        """
+        Create the pruner of the tuning study. Steps are boosting rounds: the median pruner stops a trial whose
+        validation MAPE is worse than the median of earlier trials at the same round, the successive-halving
+        pruner keeps only the best third of the trials at each rung of rounds. Subsampled trials report nothing,
+        so both compare full-fidelity trials only; the median pruner starts after five of them have completed.
+
+        Returns:
+            optuna.pruners.BasePruner: The pruner.
+        """
+        if self.pruner == 'median':
+            subsampled = self.subsample_trials if self.subsample_days is not None else 0
+            return optuna.pruners.MedianPruner(n_startup_trials=subsampled + 5, n_warmup_steps=30, interval_steps=self.report_every)
+        if self.pruner == 'halving':
+            return optuna.pruners.SuccessiveHalvingPruner(min_resource=30, reduction_factor=3)
+        return optuna.pruners.NopPruner()
+
+    def _pruning_callback(self, trial, n_estimators):
+        """
+        Create a LightGBM callback reporting the validation MAPE (in percent) to the trial every `report_every`
+        rounds, and stopping the fit when the pruner decides the trial is hopeless.
+        """
+        start_time = time.time()
+
+        def callback(env):
+            rounds = env.iteration + 1
+            if rounds % self.report_every:
+                return
+            mape = [result[2] for result in env.evaluation_result_list if result[1] == 'mape'][0]
+            trial.report(mape * 100, rounds)
+            if trial.should_prune():
+                # the rounds left are not boosted; estimated from the pace so far
+                elapsed = time.time() - start_time
+                trial.set_user_attr('saved_seconds', elapsed / rounds * (n_estimators - rounds))
+                raise optuna.TrialPruned(f'pruned after {rounds} rounds')
+        return callback
+
+    def _subsample(self, trial, X_train, train_set):
+        """
+        Keep a random fraction of the training days for the first trials of the study (low fidelity).
+        The subset shares the bins of the full training set.
+
+        Returns:
+            tuple: Training set of the trial and its fidelity (fraction of the training days).
+        """
+        if self.subsample_days is None or trial.number >= self.subsample_trials:
+            trial.set_user_attr('fidelity', 1.0)
+            return train_set, 1.0
+        days = X_train.index.normalize()
+        unique_days = days.unique()
+        rng = np.random.default_rng(trial.number)
+        keep = rng.choice(unique_days, size=max(1, int(len(unique_days) * self.subsample_days)), replace=False)
+        trial.set_user_attr('fidelity', self.subsample_days)
+        return train_set.subset(np.flatnonzero(days.isin(keep)).tolist()), self.subsample_days
+
+    def _objective(self, trial, X_train, y_train, X_valid, y_valid, num_threads):
+        """
+        Train one trial's LightGBM model and score it on the validation set; hopeless trials are pruned
+        while boosting. max_bin is searched on a grid of 25 (200, 225, ..., 300) rather than every integer
+        from 200 to 300, so that the trials share a few binned datasets instead of binning for almost every trial.
+
+        Returns:
+            float: Validation MAPE in percent.
+        """
+        param = {
+            "objective": "regression",
+            "metric": "mape",  
+            "boosting_type": "gbdt",
+            "n_estimators": trial.suggest_int("n_estimators", 100, 1000, step=100),
+            "lambda_l1": trial.suggest_float("lambda_l1", 0, 100, step=5),
+            "lambda_l2": trial.suggest_float("lambda_l2", 0, 100, step=5),
+            "num_leaves": trial.suggest_int("num_leaves", 50, 10000, step=50),
+            "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", 200, 10000, step=100),
+            # a coarse grid, so that the few bin counts tried are binned once and shared by the trials
+            "max_bin": trial.suggest_int("max_bin", 200, 300, step=25),
+            "feature_fraction": trial.suggest_float("feature_fraction", 0.3, 1.0, step=0.1),
+            "bagging_fraction": trial.suggest_float("bagging_fraction", 0.3, 1.0, step=0.1),
+            "bagging_freq": trial.suggest_int("bagging_freq", 1, 7),
+            "min_gain_to_split": trial.suggest_float("min_gain_to_split", 0, 15),
+            'max_depth': trial.suggest_int('max_depth', 3, 15),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, step=0.01),
+            }
+
+        n_estimators = param.pop('n_estimators')
+        train_set = self.datasets.get('train', X_train, y_train, param['max_bin'])
+        valid_set = self.datasets.get('valid', X_valid, y_valid, param['max_bin'], reference=train_set)
+        train_set, fidelity = self._subsample(trial, X_train, train_set)
+        callbacks = [lgb.early_stopping(10, verbose=False)]
+        if fidelity == 1.0:
+            # subsampled trials score on another scale, so they neither report to nor are judged by the pruner
+            callbacks.append(self._pruning_callback(trial, n_estimators))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)  
+            with redirect_stdout(open(os.devnull, 'w')), redirect_stderr(open(os.devnull, 'w')):
+                booster = lgb.train(
+                    {**param, 'num_threads': num_threads, 'feature_pre_filter': False, 'verbose': -1},
+                    train_set, num_boost_round=n_estimators, valid_sets=[valid_set], callbacks=callbacks
+                )
+        preds = BoosterRegressor(booster).predict(X_valid)
+        error = round(mean_absolute_percentage_error(y_valid, preds) * 100, 2)
+        return error
+
+    def _run_trials(self, storage_path, study_name, n_trials, X_train, y_train, X_valid, y_valid, num_threads):
+        """
+        Run trials of a stored study; every tuning worker process runs its share through this method.
+
+        Returns:
+            int: Number of trials run.
+        """
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        # pruners are not stored with the study, so every worker attaches its own
+        study = optuna.load_study(study_name=study_name, storage=journal_storage(storage_path), pruner=self._make_pruner())
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)  
+            with redirect_stdout(open(os.devnull, 'w')), redirect_stderr(open(os.devnull, 'w')):
+                study.optimize(lambda trial: self._objective(trial, X_train, y_train, X_valid, y_valid, num_threads),
+                               n_trials=n_trials)
+        return n_trials
+
+    def _log_pruning(self, study, first):
+        """
+        Log how many of the trials run since trial `first` were pruned and the boosting time that saved.
+        """
+        trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED))[first:]
+        pruned = [trial for trial in trials if trial.state == TrialState.PRUNED]
+        saved = sum(trial.user_attrs.get('saved_seconds', 0) for trial in pruned)
+        print(f'{len(pruned)} of {len(trials)} trials pruned, about {saved:.0f}s of boosting saved.')
+        training_logs.info('%s of %s trials pruned, about %.0fs of boosting saved.', len(pruned), len(trials), saved)
+
+    def _best_params(self, study, fallback=None):
+        """
+        Return the parameters of the best trial scored on all training days, falling back to the best
+        subsampled trial when no full-fidelity trial completed, and to `fallback` (the previous best
+        parameters of a warm-started study) when no trial completed at all.
+        """
+        trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+        if not trials:
+            if fallback is None:
+                raise RuntimeError(f'no trial of study {study.study_name} completed (all were pruned or failed)')
+            print(f'No trial of study {study.study_name} completed; the previous best parameters are kept.')
+            training_logs.warning('No trial of study %s completed; the previous best parameters are kept.', study.study_name)
+            return dict(fallback)
+        full = [trial for trial in trials if trial.user_attrs.get('fidelity', 1.0) == 1.0]
+        return min(full or trials, key=lambda trial: trial.value).params
+
+    def _hyperparameter_tuning(self, X_train, y_train, X_valid, y_valid, n_trials, best_features, study_name=None, n_jobs=-1,
+                               enqueue=None):
+        """
+        Perform hyperparameter tuning using Optuna. Trials run in parallel worker processes coordinated through
+        a journal file under TUNING_PATH, so that a named study interrupted by a crash resumes where it stopped.
 
         Args:
             X_train (pd.DataFrame): Features of the training set.
@@ -114,81 +387,197 @@ class ModelTraining:
             y_valid (pd.DataFrame): Target variable of the validation set.
             n_trials (int): Number of hyperparameter tuning trials.
             best_features (list): List of best features.
+            study_name (str): Name of the study to create or resume (a one-off study when None).
+            n_jobs (int): CPU budget shared by trials and LightGBM threads (-1 for all cores).
+            enqueue (list): Parameter sets a new study runs first.
 
         Returns:
             dict: Best hyperparameters found during tuning.
         """
+        storage_path = None
         try:
-            def objective(trial):
-                param = {
-                    "objective": "regression",
-                    "metric": "mape",  
-                    "boosting_type": "gbdt",
-                    "n_estimators": trial.suggest_int("n_estimators", 100, 1000, step=100),
-                    "lambda_l1": trial.suggest_float("lambda_l1", 0, 100, step=5),
-                    "lambda_l2": trial.suggest_float("lambda_l2", 0, 100, step=5),
-                    "num_leaves": trial.suggest_int("num_leaves", 50, 10000, step=50),
-                    "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", 200, 10000, step=100),
-                    "max_bin": trial.suggest_int("max_bin", 200, 300),
-                    "feature_fraction": trial.suggest_float("feature_fraction", 0.3, 1.0, step=0.1),
-                    "bagging_fraction": trial.suggest_float("bagging_fraction", 0.3, 1.0, step=0.1),
-                    "bagging_freq": trial.suggest_int("bagging_freq", 1, 7),
-                    "min_gain_to_split": trial.suggest_float("min_gain_to_split", 0, 15),
-                    'max_depth': trial.suggest_int('max_depth', 3, 15),
-                    'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, step=0.01),
-                    }
+            X_train, X_valid = X_train[best_features], X_valid[best_features]
+            # one-off studies get a unique name, so that two in the same second do not share a journal
+            name = study_name or f'tuning_{os.getpid()}_{uuid.uuid4().hex[:8]}'
+            os.makedirs(TUNING_PATH, exist_ok=True)
+            self._clear_journals()
+            storage_path = os.path.join(TUNING_PATH, f'{name}.journal')
+            study = self._open_study(storage_path, name, best_features)
+            if enqueue and not study.trials:
+                for params in enqueue:
+                    study.enqueue_trial(params, skip_if_exists=True)
 
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", category=UserWarning)  
-                    with redirect_stdout(open(os.devnull, 'w')), redirect_stderr(open(os.devnull, 'w')):
-                        model = lgb.LGBMRegressor(**param, verbose=-1)
-                        model.fit(
-                            X_train[best_features], y_train,
-                            eval_set=[(X_valid[best_features], y_valid)],
-                            early_stopping_rounds=10, eval_metric='mape', verbose=False
-                        )
-                preds = model.predict(X_valid[best_features])
-                error = round(mean_absolute_percentage_error(y_valid, preds) * 100, 2)
-            
-                return error
+            # only finished trials count, so trials cut off by a crash are run again
+            finished = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED))
+            remaining = n_trials - len(finished)
+            if remaining > 0:
+                workers, num_threads = self._cpu_split(remaining, n_jobs)
+                shares = [remaining // workers + (i < remaining % workers) for i in range(workers)]
+                start_time = time.time()
+                if workers == 1:
+                    self._run_trials(storage_path, name, remaining, X_train, y_train, X_valid, y_valid, num_threads)
+                else:
+                    Parallel(n_jobs=workers, backend='loky')(
+                        delayed(self._run_trials)(storage_path, name, share, X_train, y_train, X_valid, y_valid, num_threads)
+                        for share in shares)
+                training_logs.info('%s trials of %s run in %.1fs (%s workers x %s threads).',
+                                   remaining, name, time.time() - start_time, workers, num_threads)
+            else:
+                training_logs.info('Study %s already has %s completed trials.', name, n_trials)
 
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=UserWarning)  
-                with redirect_stdout(open(os.devnull, 'w')), redirect_stderr(open(os.devnull, 'w')):
-                    study = optuna.create_study(direction='minimize')
-                    study.optimize(objective, n_trials=n_trials)
-            best_params = study.best_params
+            # the workers' trials are read back from the journal
+            study = optuna.load_study(study_name=name, storage=journal_storage(storage_path))
+            self._log_pruning(study, len(finished))
+            best_params = self._best_params(study, enqueue[0] if enqueue else None)
+            self.last_trials = [{'number': trial.number, 'state': trial.state.name, 'value': trial.value,
+                                 'fidelity': trial.user_attrs.get('fidelity', 1.0), 'params': trial.params}
+                                for trial in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED))]
             return best_params
         except Exception as e:
             print('Error during hyperpameters tuning: ', str(e))
             training_logs.error('Error during hyperpameters tuning: %s', str(e)) 
+        finally:
+            # a one-off study cannot be resumed, so its journal is removed whether or not it succeeded
+            if study_name is None and storage_path and os.path.exists(storage_path):
+                os.remove(storage_path)
+
+
+    def _fingerprint(self, data, columns):
+        """
+        Summarize data by its span and the mean and standard deviation of the given columns.
+
+        Args:
+            data (pd.DataFrame): DataFrame containing the data, e.g. the validation split.
+            columns (list): Columns to summarize, e.g. the selected features and the target.
+
+        Returns:
+            dict: Fingerprint of the data.
+        """
+        columns = [column for column in columns if column in data.columns]
+        values = data[columns].to_numpy(dtype='float64')
+        stats = dict(zip(columns, zip(np.nanmean(values, axis=0).tolist(), np.nanstd(values, axis=0).tolist())))
+        return {'rows': len(data), 'first': str(data['datetime'].iloc[0]),
+                'last': str(data['datetime'].iloc[-1]), 'stats': stats}
+
+    def _drift(self, previous, current, columns):
+        """
+        Measure how far the data moved between two fingerprints: the largest shift of the mean, in standard
+        deviations, or relative change of the standard deviation over the given columns.
+
+        Returns:
+            float: Drift (infinite when a column is missing from either fingerprint).
+        """
+        drift = 0.0
+        for column in columns:
+            if column not in previous['stats'] or column not in current['stats']:
+                return float('inf')
+            (old_mean, old_std), (new_mean, new_std) = previous['stats'][column], current['stats'][column]
+            scale = old_std if old_std > 0 else max(abs(old_mean), 1.0)
+            drift = max(drift, abs(new_mean - old_mean) / scale, abs(new_std - old_std) / scale)
+        return drift
 
+    def _load_tuning_record(self, name):
+        """
+        Load the outcome of the previous tuning saved under a name, or None.
+        """
+        file_path = os.path.join(TUNING_PATH, f'{name}_tuning.json')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r') as file:
+            return json.load(file)
 
-    def _features_n_params(self, training_data, n_trials, n_features):
+    def _save_tuning_record(self, name, record):
+        """
+        Save the outcome of a tuning: best features and parameters, the trial history and the data fingerprint.
         """
-        Find the best features and hyperparameters for training the model.
+        os.makedirs(TUNING_PATH, exist_ok=True)
+        tmp_path = os.path.join(TUNING_PATH, f'{name}_tuning.json.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(record, file)
+        os.replace(tmp_path, os.path.join(TUNING_PATH, f'{name}_tuning.json'))
+
+    def _tuning_plan(self, record, fingerprint, n_trials):
+        """
+        Decide the trial budget and the warm-start configurations from the previous tuning and the drift of the
+        validation data over the previously selected features and the target. The previous tuning is reused as it
+        is for at most `max_skips` consecutive runs, so that slow drift does not keep it for ever.
+
+        Returns:
+            tuple: Number of trials (0 to reuse the previous features and parameters) and the parameter sets to enqueue.
+        """
+        if record is None:
+            return n_trials, []
+        trials = [trial for trial in record['trials'] if trial['state'] == 'COMPLETE' and trial['fidelity'] == 1.0]
+        enqueue = [trial['params'] for trial in sorted(trials, key=lambda trial: trial['value'])[:self.warm_trials]]
+        for params in enqueue:
+            # snapped onto the grid of binned datasets
+            params['max_bin'] = int(min(300, max(200, round(params['max_bin'] / 25) * 25)))
+        drift = self._drift(record['fingerprint'], fingerprint, record['best_features'] + ['target'])
+        skipped = record.get('skipped', 0)
+        if drift < self.skip_drift and skipped < self.max_skips:
+            plan = 0
+        elif drift < self.shrink_drift:
+            plan = min(n_trials, self.min_trials)
+        else:
+            plan = n_trials
+        print(f'Data drift since the last tuning: {drift:.3f} after {skipped} skipped runs, {plan} trials planned.')
+        training_logs.info('Data drift since the last tuning: %.3f after %s skipped runs, %s trials planned.', drift, skipped, plan)
+        return plan, enqueue
+
+    def _features_n_params(self, training_data, n_trials, n_features, study_name=None, n_jobs=-1, warm_start=None):
+        """
+        Find the best features and hyperparameters for training the model. With `warm_start`, the outcome is
+        saved under that name; the next run starts its study from the previous best configurations, and shrinks
+        or skips the search when the data drifted little.
 
         Args:
             training_data (pd.DataFrame): DataFrame containing the input data.
             n_trials (int): Number of hyperparameter tuning trials.
             n_features (int): Number of top features to select.
+            study_name (str): Name of the tuning study to create or resume (a one-off study when None).
+            n_jobs (int): CPU budget of the tuning (-1 for all cores).
+            warm_start (str): Name the tuning outcome is saved and warm-started under (e.g. the market type).
 
         Returns:
             tuple: Tuple containing best features and best hyperparameters.
         """
+        self.datasets.clear()
+
         # Split the data
         training_upto = training_data.iloc[int(training_data.shape[0]*0.7)]['datetime'].strftime('%Y-%m-%d')      
         validation_upto = training_data.iloc[int(training_data.shape[0]*0.85)]['datetime'].strftime('%Y-%m-%d')        
         X_train, y_train, X_valid, y_valid, _, _ = self._split_data(training_data, training_upto, validation_upto)
         
+        if warm_start is None:
+            best_features = self._find_best_features(X_train, y_train, X_valid, y_valid, n_features)
+            best_params = self._hyperparameter_tuning(X_train, y_train, X_valid, y_valid, n_trials, best_features, study_name, n_jobs)
+            return best_features, best_params
+
+        # drift is measured on the validation split, the recent data the parameters are scored on
+        validation = training_data[(training_data['datetime'] >= training_upto) & (training_data['datetime'] < validation_upto)]
+        record = self._load_tuning_record(warm_start)
+        fingerprint = self._fingerprint(validation, record['best_features'] + ['target']) if record is not None else None
+        n_trials, enqueue = self._tuning_plan(record, fingerprint, n_trials)
+        if n_trials == 0:
+            self._save_tuning_record(warm_start, {**record, 'skipped': record.get('skipped', 0) + 1})
+            return record['best_features'], record['best_params']
         best_features = self._find_best_features(X_train, y_train, X_valid, y_valid, n_features)
-        best_params = self._hyperparameter_tuning(X_train, y_train, X_valid, y_valid, n_trials, best_features)
+        best_params = self._hyperparameter_tuning(X_train, y_train, X_valid, y_valid, n_trials, best_features, study_name, n_jobs,
+                                                  enqueue)
+        if best_params is not None:
+            self._save_tuning_record(warm_start, {'best_features': best_features, 'best_params': best_params,
+                                                  'trials': self.last_trials, 'skipped': 0,
+                                                  'fingerprint': self._fingerprint(validation, best_features + ['target'])})
+            # the outcome is in the record now, so the study will not be resumed
+            if study_name is not None and os.path.exists(os.path.join(TUNING_PATH, f'{study_name}.journal')):
+                os.remove(os.path.join(TUNING_PATH, f'{study_name}.journal'))
         return best_features, best_params
 
 
-    def _train_model(self, X_train, y_train, best_params, best_features, objective, alpha=None):
+    def _train_model(self, X_train, y_train, best_params, best_features, objective, alpha=None, num_threads=None):
         """
-        Train the LightGBM model.
+        Train the LightGBM model on the binned dataset of the training set, which the point and quantile
+        models of the same features and bin count share.
 
         Args:
             X_train (pd.DataFrame): Features of the training set.
@@ -197,20 +586,62 @@ class ModelTraining:
             best_features (list): List of best features.
             objective (str): Objective function for the model.
             alpha (float): Regularization parameter.
+            num_threads (int): LightGBM threads (all cores when None).
 
         Returns:
-            lightgbm.LGBMRegressor: Trained LightGBM model.
+            BoosterRegressor: Trained LightGBM model.
         """
         try:
+            params = dict(best_params)
+            n_estimators = params.pop('n_estimators', 100)
+            params.update({'objective': objective, 'feature_pre_filter': False, 'verbose': -1})
+            if alpha is not None:
+                params['alpha'] = alpha
+            if num_threads is not None:
+                params['num_threads'] = num_threads
+            train_set = self.datasets.get('final_train', X_train[best_features], y_train, params.get('max_bin', 255))
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore", category=UserWarning)  
                 with redirect_stdout(open(os.devnull, 'w')), redirect_stderr(open(os.devnull, 'w')):
-                    model = lgb.LGBMRegressor(objective=objective, **best_params, alpha=alpha)
-                    model.fit(
-                        X_train[best_features], y_train, 
-                        verbose=-1
-                    )
-            return model
+                    booster = lgb.train(params, train_set, num_boost_round=n_estimators)
+            return BoosterRegressor(booster)
         except Exception as e:
             print('Error while training model: ', str(e))
             training_logs.error('Error while training model: %s', str(e)) 
+
+    def train_models(self, X_train, y_train, best_params, best_features, objectives, n_jobs=-1):
+        """
+        Train models of several objectives on the same data together, in a process pool. The CPU budget is
+        split between the fits, and all of them load the one binned dataset of the training set.
+
+        Args:
+            X_train (pd.DataFrame): Features of the training set.
+            y_train (pd.DataFrame): Target variable of the training set.
+            best_params (dict): Best hyperparameters for the models.
+            best_features (list): List of best features.
+            objectives (dict): Objective and alpha of every model by name,
+                               e.g. {'forecast': ('regression', None), 'lower': ('quantile', 0.1)}.
+            n_jobs (int): CPU budget (-1 for all cores).
+
+        Returns:
+            dict: Trained models by name.
+        """
+        try:
+            X_train = X_train[best_features]
+            # binned (and saved) once here, so that the workers only load it
+            self.datasets.get('final_train', X_train, y_train, best_params.get('max_bin', 255))
+            workers, num_threads = self._cpu_split(len(objectives), n_jobs)
+            start_time = time.time()
+            if workers == 1:
+                models = [self._train_model(X_train, y_train, best_params, best_features, objective, alpha, num_threads)
+                          for objective, alpha in objectives.values()]
+            else:
+                models = Parallel(n_jobs=workers, backend='loky')(
+                    delayed(self._train_model)(X_train, y_train, best_params, best_features, objective, alpha, num_threads)
+                    for objective, alpha in objectives.values())
+            training_logs.info('%s models trained in %.1fs (%s workers x %s threads).',
+                               len(objectives), time.time() - start_time, workers, num_threads)
+            return dict(zip(objectives, models))
+        except Exception as e:
+            print('Error while training models: ', str(e))
+            training_logs.error('Error while training models: %s', str(e))
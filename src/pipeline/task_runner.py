@@ -0,0 +1,99 @@
+'''
+This script runs a small graph of dependent tasks concurrently.
+It includes a class `TaskRunner` which starts every task as soon as its dependencies have finished,
+records per-task timing and failures, and skips only the tasks that depend on a failed one.
+
+Author: Aman Bhatt
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TaskRunner:
+    def __init__(self, logger, max_workers=None):
+        """
+        Initializes the TaskRunner.
+
+        Args:
+            logger (logging.Logger): Logger used for the per-task report.
+            max_workers (int): Maximum number of tasks running at the same time (defaults to the number of tasks).
+        """
+        self.logger = logger
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.results = {}
+
+    def add_task(self, name, func, depends_on=None):
+        """
+        Registers a task.
+
+        Args:
+            name (str): Unique name of the task.
+            func (callable): Function called with the results of its dependencies as keyword arguments.
+            depends_on (list): Names of the tasks that must succeed before this one starts.
+        """
+        self.tasks[name] = {'func': func, 'depends_on': list(depends_on or [])}
+
+    def _run_task(self, name, kwargs):
+        """
+        Runs one task and records its status, result and duration.
+        """
+        start_time = time.time()
+        try:
+            result = self.tasks[name]['func'](**kwargs)
+            return {'status': 'success', 'result': result, 'error': None, 'duration': time.time() - start_time}
+        except Exception as e:
+            return {'status': 'failed', 'result': None, 'error': str(e), 'duration': time.time() - start_time}
+
+    def run(self):
+        """
+        Runs all tasks, each as soon as its dependencies have succeeded. A failed task does not abort the others;
+        only the tasks depending on it are skipped.
+
+        Returns:
+            dict: Status, result, error and duration (seconds) of every task.
+        """
+        pending = dict(self.tasks)
+        self.results = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(1, len(self.tasks))) as executor:
+            while pending or running:
+                # repeat the scan so that skips propagate through chains of dependent tasks
+                changed = True
+                while changed:
+                    changed = False
+                    for name, task in list(pending.items()):
+                        statuses = [self.results.get(dep, {}).get('status') for dep in task['depends_on']]
+                        if any(status in ['failed', 'skipped'] for status in statuses):
+                            failed = [dep for dep, status in zip(task['depends_on'], statuses) if status in ['failed', 'skipped']]
+                            self.results[name] = {'status': 'skipped', 'result': None, 'duration': 0,
+                                                  'error': f'dependency {", ".join(failed)} did not succeed'}
+                            del pending[name]
+                            changed = True
+                        elif all(status == 'success' for status in statuses):
+                            kwargs = {dep: self.results[dep]['result'] for dep in task['depends_on']}
+                            running[executor.submit(self._run_task, name, kwargs)] = name
+                            del pending[name]
+                if not running:
+                    if pending:
+                        raise ValueError(f'Unknown or circular dependencies: {", ".join(pending)}')
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future)] = future.result()
+        self.report()
+        return self.results
+
+    def report(self):
+        """
+        Prints and logs the status and duration of every task.
+        """
+        for name in self.tasks:
+            result = self.results[name]
+            if result['status'] == 'success':
+                print(f'  {name}: success in {result["duration"]:.1f}s')
+                self.logger.info('  %s: success in %.1fs', name, result['duration'])
+            else:
+                print(f'  {name}: {result["status"]} after {result["duration"]:.1f}s ({result["error"]})')
+                self.logger.error('  %s: %s after %.1fs (%s)', name, result['status'], result['duration'], result['error'])
@@ -1,6 +1,17 @@
 import pandas as pd
+import numpy as np
 import os, logging
 import pickle
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, where directories in use cannot be replaced anyway
+    fcntl = None
 
 def load_pickle(path, file_name):
     """
@@ -30,6 +41,158 @@ def save_pickle(data, path, file_name):
     with open(os.path.join(path, f'{file_name}'), 'wb') as file:
         pickle.dump(data, file)
 
+@contextmanager
+def directory_lock(dir_path, exclusive=False):
+    """
+    Holds an advisory lock on a column directory, through a '.lock' file next to it. Readers share the lock
+    while they open the files; a writer takes it exclusively only to swap in a new version.
+
+    Args:
+        dir_path (str): The locked directory.
+        exclusive (bool): Take the lock exclusively (writers) instead of shared (readers).
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(dir_path) or '.', exist_ok=True)
+    with open(dir_path + '.lock', 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+def save_columns(data, dir_path):
+    """
+    Save the DataFrame as one .npy file per column so that it can be memory-mapped.
+    The files are written to a private temporary directory next to dir_path and swapped in under an exclusive
+    lock, so concurrent writers never touch each other's files and readers see either version complete.
+    Files of the replaced version that are already memory-mapped stay valid until they are unmapped.
+
+    Args:
+        data (pd.DataFrame): The DataFrame to save.
+        dir_path (str): The directory to save the column files in (replaced if it exists).
+    """
+    parent, name = os.path.split(dir_path)
+    os.makedirs(parent or '.', exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f'{name}.', suffix='.tmp', dir=parent or None)
+    try:
+        for i, column in enumerate(data.columns):
+            values = data[column].to_numpy()
+            np.save(os.path.join(tmp_path, f'{i}.npy'), values, allow_pickle=values.dtype == object)
+        with open(os.path.join(tmp_path, 'columns.json'), 'w') as file:
+            json.dump([str(column) for column in data.columns], file)
+
+        with directory_lock(dir_path, exclusive=True):
+            old_path = None
+            if os.path.exists(dir_path):
+                old_path = tempfile.mkdtemp(prefix=f'{name}.', suffix='.old', dir=parent or None)
+                os.replace(dir_path, os.path.join(old_path, name))
+            os.replace(tmp_path, dir_path)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+def load_columns(dir_path, mmap_mode=None, columns=None, usecols=None):
+    """
+    Reads a DataFrame saved with save_columns.
+
+    Args:
+        dir_path (str): The directory holding the column files.
+        mmap_mode (str): Memory-map mode passed to np.load ('c' maps the files copy-on-write,
+                         None reads them into memory).
+        columns (list): Column names of directories written before columns.json was saved with them
+                        (e.g. from the store manifest); columns.json takes precedence when present.
+        usecols (list): Read only these columns (None reads all).
+
+    Returns:
+        pd.DataFrame: The DataFrame, backed by the memory-mapped files when mmap_mode is set.
+    """
+    with directory_lock(dir_path):
+        columns_path = os.path.join(dir_path, 'columns.json')
+        if os.path.exists(columns_path):
+            with open(columns_path, 'r') as file:
+                columns = json.load(file)
+        elif columns is None:
+            raise FileNotFoundError(f'No columns.json in {dir_path} and no column names given')
+
+        data = {}
+        for i, column in enumerate(columns):
+            if usecols is not None and column not in usecols:
+                continue
+            file_path = os.path.join(dir_path, f'{i}.npy')
+            try:
+                data[column] = np.load(file_path, mmap_mode=mmap_mode)
+            except ValueError:
+                # object columns are pickled and cannot be memory-mapped
+                data[column] = np.load(file_path, allow_pickle=True)
+    # copy=False keeps every column a view on its file instead of consolidating them into one block
+    return pd.DataFrame(data, copy=False)
+
+def load_mmap(path, file_name):
+    """
+    Drop-in replacement for load_pickle that reads the dataset from memory-mapped column files.
+    Datasets in the partitioned store are read straight from the partition files, so no second copy is kept
+    on disk and concurrent scripts share the pages through the OS cache. Datasets only available as a pickle
+    are written once as column files under <path>/mmap/<file_name> and rebuilt whenever the pickle changes.
+
+    Args:
+        file_name (str): The name of the dataset.
+        path (str): The path where the pickle file is located.
+
+    Returns:
+        pd.DataFrame: The DataFrame, mapped copy-on-write so that in-place edits stay private.
+    """
+    from config.paths import STORE_DATA_PATH
+    from src.data_storage.partitioned_store import processed_store
+
+    cache_path = os.path.join(path, 'mmap', f'{file_name}')
+    signature_path = cache_path + '.json'
+    pickle_path = os.path.join(path, f'{file_name}')
+    if os.path.exists(os.path.join(STORE_DATA_PATH, file_name, 'manifest.json')):
+        # copies built from the store before it was mapped directly are no longer read
+        if os.path.exists(signature_path):
+            with directory_lock(cache_path, exclusive=True):
+                shutil.rmtree(cache_path, ignore_errors=True)
+                if os.path.exists(signature_path):
+                    os.remove(signature_path)
+        return processed_store(file_name).load(mmap_mode='c')
+
+    source_stat = os.stat(pickle_path)
+    signature = [pickle_path, source_stat.st_mtime_ns, source_stat.st_size]
+    if os.path.exists(signature_path):
+        with open(signature_path, 'r') as file:
+            if json.load(file) == signature:
+                return load_columns(cache_path, mmap_mode='c')
+
+    data = pd.read_pickle(pickle_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    save_columns(data.reset_index(drop=True), cache_path)
+    tmp_path = f'{signature_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(signature, file)
+    os.replace(tmp_path, signature_path)
+    return load_columns(cache_path, mmap_mode='c')
+
+def day_checksums(data):
+    """
+    Checksums the values of every day, so that a day whose values changed is found even when its row count
+    did not.
+
+    Args:
+        data (pd.DataFrame): Data with a datetime column, sorted by datetime.
+
+    Returns:
+        dict: Short hex digest of every day, keyed by 'YYYY-MM-DD' in order.
+    """
+    row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    days = data['datetime'].dt.normalize().to_numpy()
+    bounds = np.flatnonzero(np.r_[True, days[1:] != days[:-1], True])
+    return {str(days[start])[:10]: hashlib.sha1(row_hashes[start:end].tobytes()).hexdigest()[:16]
+            for start, end in zip(bounds[:-1], bounds[1:])}
+
 def save_excel(data, path, file_name):
     """
     Save the data as excel.